@@ -0,0 +1,70 @@
+"""Compare two benchmark reports and flag latency or throughput regressions.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 10]
+
+Exits with status 1 when any operation's p95 latency grew, or its throughput
+fell, by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+
+
+def change_percent(before: float, after: float) -> float:
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> List[str]:
+    """Print a per-operation comparison and return the regressions found."""
+    regressions = []
+    for mix, result in candidate["results"].items():
+        previous = baseline["results"].get(mix)
+        if previous is None:
+            continue
+        for operation, stats in result["operations"].items():
+            before = previous["operations"].get(operation)
+            if before is None:
+                continue
+            p95 = change_percent(before["latency_ms"]["p95"], stats["latency_ms"]["p95"])
+            throughput = change_percent(before["throughput_rps"], stats["throughput_rps"])
+            line = (
+                f"{mix:>6} {operation:<7} p95 {before['latency_ms']['p95']:>9.2f} -> {stats['latency_ms']['p95']:>9.2f} ms "
+                f"({p95:+.1f}%)  throughput {before['throughput_rps']:>8.2f} -> {stats['throughput_rps']:>8.2f} rps "
+                f"({throughput:+.1f}%)"
+            )
+            print(line)
+            if p95 > threshold or throughput < -threshold:
+                regressions.append(line)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed change in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    with open(args.candidate, encoding="utf-8") as handle:
+        candidate = json.load(handle)
+
+    for report in (baseline, candidate):
+        meta = report["meta"]
+        print(f"{meta['git_revision']}: {meta['target']}, {meta['database']}, size {meta['size']}, "
+              f"concurrency {meta['concurrency']}")
+    regressions = compare(baseline, candidate, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:g}%:", file=sys.stderr)
+        for line in regressions:
+            print(line, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
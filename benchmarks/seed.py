@@ -0,0 +1,134 @@
+"""Seed a database with benchmark users and tasks.
+
+Usage:
+    python -m benchmarks.seed --size 100k [--database-url URL]
+
+Benchmark users are named bench-user-<n> and share BENCH_PASSWORD. Seeding is
+skipped when the database already holds the users of the requested size, so
+one seeded database can serve many runs.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+# Users and tasks per dataset size
+SIZES: Dict[str, Tuple[int, int]] = {
+    "1k": (10, 1_000),
+    "100k": (100, 100_000),
+    "1m": (1_000, 1_000_000),
+}
+
+BENCH_PASSWORD = "bench-password"
+INSERT_CHUNK = 10_000
+
+
+def bench_username(index: int) -> str:
+    return f"bench-user-{index}"
+
+
+def default_database_url(size: str) -> str:
+    """A SQLite file per size under benchmarks/, reused between runs."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"bench-{size}.db")
+    return f"sqlite:///{path}"
+
+
+def use_database(database_url: str) -> None:
+    """Point the app at database_url; must run before anything imports src."""
+    os.environ["DATABASE_URL"] = database_url
+    # Derive the async URL from database_url and keep reads off any replica in .env
+    os.environ["DATABASE_ASYNC_URL"] = ""
+    os.environ["DATABASE_READ_URL"] = ""
+
+
+def seed(size: str) -> Dict[str, int]:
+    """Create the tables and the users and tasks of a dataset size, unless already there."""
+    from sqlalchemy import func, insert, select
+
+    from src.auth import get_password_hash
+    from src.database import TaskDB, User, UserTaskState, create_tables, engine
+
+    user_count, task_count = SIZES[size]
+    create_tables()
+
+    with engine.begin() as connection:
+        seeded = connection.execute(
+            select(func.count()).select_from(User).where(User.username.like("bench-user-%"))
+        ).scalar_one()
+    if seeded >= user_count:
+        print(f"Database already holds {seeded} benchmark users, skipping seed", file=sys.stderr)
+        return {"users": user_count, "tasks": task_count}
+    if seeded:
+        raise SystemExit(
+            f"Database holds {seeded} benchmark users but size {size} needs {user_count}; "
+            "seed into an empty database"
+        )
+
+    started = time.perf_counter()
+    # One bcrypt hash shared by every user; hashing each would dominate the seed
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    per_user = task_count // user_count
+
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {
+                "username": bench_username(index),
+                "email": f"{bench_username(index)}@example.com",
+                "hashed_password": hashed_password,
+                "is_active": True,
+            }
+            for index in range(user_count)
+        ])
+        user_ids = connection.execute(
+            select(User.id).where(User.username.like("bench-user-%")).order_by(User.id)
+        ).scalars().all()
+
+        states = []
+        rows = []
+        for owner_id in user_ids:
+            completed_count = 0
+            for seq in range(1, per_user + 1):
+                completed = rng.random() < 0.3
+                completed_count += completed
+                rows.append({
+                    "title": f"Benchmark task {seq}",
+                    "description": "Seeded by benchmarks.seed",
+                    "completed": completed,
+                    "deadline": now + timedelta(hours=rng.randint(-720, 720)) if rng.random() < 0.5 else None,
+                    "owner_id": owner_id,
+                    "change_seq": seq,
+                })
+                if len(rows) >= INSERT_CHUNK:
+                    connection.execute(insert(TaskDB), rows)
+                    rows = []
+            states.append({
+                "owner_id": owner_id,
+                "change_seq": per_user,
+                "total_count": per_user,
+                "completed_count": completed_count,
+            })
+        if rows:
+            connection.execute(insert(TaskDB), rows)
+        connection.execute(insert(UserTaskState), states)
+
+    print(f"Seeded {user_count} users and {per_user * user_count} tasks in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return {"users": user_count, "tasks": per_user * user_count}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed benchmark users and tasks")
+    parser.add_argument("--size", choices=SIZES, default="1k")
+    parser.add_argument("--database-url", help="Defaults to benchmarks/bench-<size>.db (SQLite)")
+    args = parser.parse_args()
+
+    use_database(args.database_url or default_database_url(args.size))
+    seed(args.size)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,8 @@ from typing import Dict, Any, List, Optional
 import logging
 
 from .assistant_manager import assistant_manager, AssistantType
-from src.auth.dependencies import get_current_user
-from src.users.models import User
+from ..auth import get_current_user
+from ..tasks.models import User
 
 logger = logging.getLogger(__name__)
 
@@ -1,14 +1,26 @@
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from .cache import VersionedCache
+from .redis_client import redis_client
 from .config import settings
-from .database import get_db, User
+from .database import User, async_read_engine, read_session
+from .revocation import token_revocations
+from .tasks import models
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -16,6 +28,21 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Authenticated users, cached per token so authorizing a request needs no database query
+principal_cache = VersionedCache(
+    prefix="auth",
+    redis=redis_client if settings.cache_enabled else None,
+    ttl_seconds=settings.principal_cache_ttl_seconds,
+    local_ttl_seconds=settings.cache_local_ttl_seconds,
+    local_max_entries=settings.cache_local_max_entries,
+    write_marker_seconds=settings.read_replica_max_lag_seconds + settings.read_replica_check_seconds,
+)
+
+
+def principal_scope(username: str) -> str:
+    """Cache scope holding every cached principal of one user."""
+    return f"principal:{username}"
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash."""
@@ -27,68 +54,282 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash a list of passwords; run in PasswordHasher's process pool."""
+    return [get_password_hash(password) for password in passwords]
+
+
+class PasswordHasher:
+    """Runs password hashing and verification on a dedicated, bounded thread pool.
+    
+    bcrypt releases the GIL while it works, so a few threads keep a login burst
+    off the event loop. At most max_pending operations may be queued or running;
+    beyond that callers get a 503 instead of piling up, so a login storm only
+    slows down logins.
+    
+    Bulk hashing for provisioning uses a separate process pool, started on first
+    use, so it spreads across cores without taking the login threads.
+    """
+    
+    def __init__(self, max_workers: int, max_pending: int, max_processes: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_processes = max_processes or os.cpu_count() or 1
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.counters: Dict[str, Any] = {
+            "completed": 0,
+            "rejected": 0,
+            "peak_pending": 0,
+            "wait_seconds_total": 0.0,
+        }
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hasher")
+    
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent password operations, please retry",
+                headers={"Retry-After": "1"},
+            )
+        
+        def timed() -> Any:
+            return time.perf_counter(), func(*args)
+        
+        self.pending += 1
+        self.counters["peak_pending"] = max(self.counters["peak_pending"], self.pending)
+        submitted = time.perf_counter()
+        try:
+            started, result = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.pending -= 1
+        self.counters["completed"] += 1
+        self.counters["wait_seconds_total"] += started - submitted
+        return result
+    
+    async def hash(self, password: str) -> str:
+        """Hash a password without blocking the event loop."""
+        return await self._run(get_password_hash, password)
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash without blocking the event loop."""
+        return await self._run(verify_password, plain_password, hashed_password)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size, queue depth and counters."""
+        return {
+            **self.counters,
+            "wait_seconds_total": round(self.counters["wait_seconds_total"], 3),
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.pending,
+            "queued": max(0, self.pending - self.max_workers),
+        }
+    
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash many passwords in parallel across CPU cores, preserving order."""
+        if self._process_pool is None:
+            # Spawn rather than fork: the API process runs threads and an event loop
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.max_processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        loop = asyncio.get_running_loop()
+        chunk_size = max(1, -(-len(passwords) // (self.max_processes * 4)))
+        chunks = [passwords[start:start + chunk_size] for start in range(0, len(passwords), chunk_size)]
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._process_pool, hash_passwords, chunk) for chunk in chunks
+        ))
+        return [hashed for chunk in results for hashed in chunk]
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+    max_processes=settings.password_hash_processes,
+)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
+        expire = datetime.utcnow() + timedelta(minutes=settings.jwt_access_token_expire_minutes)
     
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
     return encoded_jwt
 
 
-def verify_token(token: str, credentials_exception: HTTPException) -> str:
-    """Verify and decode a JWT token."""
+def create_refresh_token(username: str) -> str:
+    """Create a single-use JWT refresh token."""
+    expire = datetime.utcnow() + timedelta(days=settings.jwt_refresh_token_expire_days)
+    to_encode = {"sub": username, "type": "refresh", "exp": expire, "jti": uuid.uuid4().hex}
+    return jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+
+
+def decode_token(token: str, credentials_exception: HTTPException) -> dict:
+    """Verify a JWT token and return its claims."""
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        return username
+        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
     except JWTError:
         raise credentials_exception
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
 
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
+def verify_token(token: str, credentials_exception: HTTPException) -> str:
+    """Verify and decode a JWT token."""
+    return decode_token(token, credentials_exception)["sub"]
+
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
     """Get user by username from database."""
-    return db.query(User).filter(User.username == username).first()
+    return await db.scalar(select(User).where(User.username == username))
 
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Get user by email from database."""
-    return db.query(User).filter(User.email == email).first()
+    return await db.scalar(select(User).where(User.email == email))
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Union[User, bool]:
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Union[User, bool]:
     """Authenticate a user with username and password."""
-    user = get_user_by_username(db, username)
+    user = await get_user_by_username(db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     return user
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """Get current authenticated user."""
+async def replica_has_user(username: str) -> bool:
+    """Whether a user may be read from the replica: there is one, and the user was not changed recently.
+    
+    Creating or changing a user leaves a write marker (see invalidate_principal).
+    """
+    if async_read_engine is None:
+        return False
+    return await principal_cache.written_recently(principal_scope(username)) is False
+
+
+async def load_principal(username: str) -> Optional[dict]:
+    """Load the cacheable fields of a user, or None if the user does not exist.
+    
+    Reads from the replica, if there is one, unless the user was changed recently.
+    """
+    async with read_session(use_replica=await replica_has_user(username)) as db:
+        user = await get_user_by_username(db, username)
+        if user is None:
+            return None
+        return models.User.model_validate(user).model_dump(mode="json")
+
+
+async def revoke_token(payload: dict) -> bool:
+    """Revoke a decoded token until it expires; False if it was already revoked."""
+    try:
+        return await token_revocations.revoke(payload["jti"], payload["exp"])
+    except RedisError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Token revocation is unavailable, please retry"
+        )
+
+
+async def use_refresh_token(refresh_token: str) -> models.User:
+    """Consume a refresh token and return its active user.
+    
+    Refresh tokens rotate: each one is revoked as it is used, so a replayed
+    token is rejected. The user is loaded directly, since a cache entry keyed
+    by a token that was just consumed could never be read again.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    payload = decode_token(refresh_token, credentials_exception)
+    if payload.get("type") != "refresh" or "jti" not in payload:
+        raise credentials_exception
+    if not await revoke_token(payload):
+        raise credentials_exception
+    
+    principal = await load_principal(payload["sub"])
+    if principal is None or not principal["is_active"]:
+        raise credentials_exception
+    return models.User.model_validate(principal)
+
+
+async def invalidate_principal(username: str) -> None:
+    """Drop every cached principal of a user, e.g. after creation, deactivation or an update.
+    
+    This also keeps the user's reads on the primary until a replica has caught up.
+    """
+    await principal_cache.bump_version(principal_scope(username))
+
+
+async def invalidate_principals(usernames: List[str]) -> None:
+    """invalidate_principal for many users in one round trip."""
+    await principal_cache.bump_versions([principal_scope(username) for username in usernames])
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> models.User:
+    """Get current authenticated user.
+    
+    The user is read through principal_cache, keyed by the token's jti and exp,
+    so a database session is only opened on a cache miss. A missing user is not
+    cached, so one lagging replica read cannot reject a token for the cache TTL.
+    Revoked tokens are rejected; see TokenRevocationList.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    username = verify_token(token, credentials_exception)
-    user = get_user_by_username(db, username)
-    if user is None:
+    payload = decode_token(token, credentials_exception)
+    if payload.get("type") == "refresh":
         raise credentials_exception
-    return user
+    if "jti" in payload and await token_revocations.is_revoked(payload["jti"]):
+        raise credentials_exception
+    username = payload["sub"]
+    
+    async def load_existing_principal() -> dict:
+        principal = await load_principal(username)
+        if principal is None:
+            raise credentials_exception
+        return principal
+    
+    principal = await principal_cache.get_or_load(
+        principal_scope(username),
+        f"{payload.get('jti', '')}:{payload.get('exp', '')}",
+        load_existing_principal
+    )
+    return models.User.model_validate(principal)
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: models.User = Depends(get_current_user)) -> models.User:
     """Get current active user."""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
+
+async def get_current_admin_user(current_user: models.User = Depends(get_current_active_user)) -> models.User:
+    """Get current active user, requiring them to be listed in settings.admin_usernames."""
+    admins = {name.strip() for name in settings.admin_usernames.split(",") if name.strip()}
+    if current_user.username not in admins:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
     return current_user
\ No newline at end of file
@@ -1,34 +1,54 @@
 from datetime import timedelta
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .auth import authenticate_user, create_access_token, get_current_active_user
+from .auth import (
+    authenticate_user, create_access_token, create_refresh_token, decode_token,
+    get_current_active_user, get_current_admin_user, oauth2_scheme, replica_has_user,
+    revoke_token, use_refresh_token,
+)
 from .config import settings
-from .database import get_db
+from .database import get_async_db, get_async_read_db, read_session
 from .tasks.crud import UserCRUD
-from .tasks.models import UserCreate, UserResponse, Token, User
+from .tasks.models import (
+    UserCreate, UserResponse, UserActiveUpdate, UserBulkCreate, UserBulkResult, Token, RefreshRequest, User,
+)
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 
+def issue_tokens(username: str) -> dict:
+    """Create a fresh access and refresh token pair for a user."""
+    access_token_expires = timedelta(minutes=settings.jwt_access_token_expire_minutes)
+    access_token = create_access_token(
+        data={"sub": username}, expires_delta=access_token_expires
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": create_refresh_token(username),
+    }
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(
     user: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_async_read_db)
 ):
     """Register a new user."""
-    # Check if user already exists
-    existing_user = UserCRUD.get_user_by_username(db, user.username)
+    # Check if user already exists; create_user still catches races and replica lag
+    existing_user = await UserCRUD.get_user_by_username(read_db, user.username)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
-    existing_email = UserCRUD.get_user_by_email(db, user.email)
+    existing_email = await UserCRUD.get_user_by_email(read_db, user.email)
     if existing_email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -36,17 +56,56 @@ async def register_user(
         )
     
     # Create new user
-    db_user = UserCRUD.create_user(db, user)
+    db_user = await UserCRUD.create_user(db, user)
+    return db_user
+
+
+@router.post("/users/bulk", response_model=UserBulkResult, status_code=status.HTTP_201_CREATED)
+async def bulk_create_users(
+    bulk: UserBulkCreate,
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Provision many users at once (admin only).
+    
+    Users whose username or email is already taken are reported in errors
+    with their index in the request.
+    """
+    users, errors = await UserCRUD.bulk_create_users(db, bulk.users)
+    return UserBulkResult(users=users, errors=errors)
+
+
+@router.patch("/users/{user_id}/active", response_model=UserResponse)
+async def set_user_active(
+    user_id: int,
+    update: UserActiveUpdate,
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Activate or deactivate a user (admin only).
+    
+    A deactivated user's outstanding tokens stop working on their next request.
+    """
+    db_user = await UserCRUD.set_user_active(db, user_id, update.is_active)
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
     return db_user
 
 
 @router.post("/login", response_model=Token)
 async def login_user(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(get_db)
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
 ):
-    """Login user and return access token."""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    """Login user and return access token.
+    
+    The user is read from the replica only if they were not created or changed
+    recently, so logging in right after registering works.
+    """
+    async with read_session(use_replica=await replica_has_user(form_data.username)) as db:
+        user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -54,12 +113,40 @@ async def login_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    return issue_tokens(user.username)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh_tokens(tokens: RefreshRequest):
+    """Exchange a refresh token for a new access and refresh token pair.
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    Each refresh token can be used once; the response carries its replacement.
+    """
+    user = await use_refresh_token(tokens.refresh_token)
+    return issue_tokens(user.username)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_user(
+    tokens: Optional[RefreshRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Revoke the current access token and, if given, the refresh token."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    payload = decode_token(token, credentials_exception)
+    if "jti" in payload:
+        await revoke_token(payload)
+    if tokens is not None:
+        refresh_payload = decode_token(tokens.refresh_token, credentials_exception)
+        if refresh_payload["sub"] != current_user.username or refresh_payload.get("type") != "refresh":
+            raise credentials_exception
+        await revoke_token(refresh_payload)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.get("/me", response_model=UserResponse)
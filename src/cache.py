@@ -0,0 +1,241 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from .config import settings
+from .redis_client import RedisClient, redis_client
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Size-bounded in-process cache whose entries expire after a TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class VersionedCache:
+    """Read-through cache with an in-process LRU tier in front of Redis.
+
+    Every key lives under a scope (for example one user) whose current version is
+    part of the key. Bumping the version makes all entries cached under the old one
+    unreachable, so a writer invalidates a whole scope with a single INCR. The
+    version itself is held locally for a short TTL, which bounds how long another
+    worker can keep serving a superseded version.
+
+    When Redis is unreachable the cache is bypassed rather than served from the
+    local tier alone, because local versions cannot see other workers' writes.
+    
+    With write_marker_seconds set, every bump also leaves a marker that expires
+    after that long, which readers use to keep recent writers off a lagging
+    read replica (see written_recently).
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        redis: Optional[RedisClient],
+        ttl_seconds: int,
+        local_ttl_seconds: float,
+        local_max_entries: int,
+        write_marker_seconds: float = 0
+    ):
+        self.prefix = prefix
+        self.write_marker_seconds = write_marker_seconds
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self.local = LRUCache(local_max_entries, local_ttl_seconds)
+        self.counters: Dict[str, int] = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "errors": 0,
+        }
+
+    def _client(self) -> Optional[aioredis.Redis]:
+        return self.redis.get() if self.redis is not None else None
+
+    def _sync_client(self) -> Optional[redis.Redis]:
+        return self.redis.get_sync() if self.redis is not None else None
+
+    def _version_key(self, scope: str) -> str:
+        return f"{self.prefix}:{scope}:version"
+    
+    def _marker_key(self, scope: str) -> str:
+        return f"{self.prefix}:{scope}:written"
+
+    def _error(self, action: str, exc: Exception) -> None:
+        self.counters["errors"] += 1
+        logger.warning(f"Cache {action} failed for {self.prefix}: {exc}")
+
+    async def get_version(self, scope: str) -> Optional[str]:
+        """Return the current version of a scope, or None if the cache is unavailable."""
+        version_key = self._version_key(scope)
+        version = self.local.get(version_key)
+        if version is not None:
+            return version
+
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            version = await client.get(version_key)
+            if version is None:
+                # Seed from the clock so a flushed Redis never reissues an old version
+                await client.set(version_key, time.time_ns(), nx=True)
+                version = await client.get(version_key)
+        except RedisError as exc:
+            self._error("version lookup", exc)
+            return None
+
+        self.local.set(version_key, version)
+        return version
+
+    async def get_or_load(self, scope: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key within scope, calling loader on a miss.
+
+        Values must be JSON-serializable.
+        """
+        version = await self.get_version(scope)
+        if version is None:
+            self.counters["bypassed"] += 1
+            return await loader()
+
+        cache_key = f"{self.prefix}:{scope}:{version}:{key}"
+        value = self.local.get(cache_key, _MISSING)
+        if value is not _MISSING:
+            self.counters["local_hits"] += 1
+            return value
+
+        client = self._client()
+        try:
+            raw = await client.get(cache_key)
+        except RedisError as exc:
+            self._error("read", exc)
+            raw = None
+        if raw is not None:
+            self.counters["redis_hits"] += 1
+            value = json.loads(raw)
+            self.local.set(cache_key, value)
+            return value
+
+        self.counters["misses"] += 1
+        value = await loader()
+        self.local.set(cache_key, value)
+        try:
+            await client.set(cache_key, json.dumps(value), ex=self.ttl_seconds)
+        except RedisError as exc:
+            self._error("write", exc)
+        return value
+
+    async def bump_version(self, scope: str) -> None:
+        """Invalidate everything cached under a scope."""
+        await self.bump_versions([scope])
+
+    async def bump_versions(self, scopes: List[str]) -> None:
+        """Invalidate several scopes in one round trip."""
+        for scope in scopes:
+            self.local.delete(self._version_key(scope))
+        client = self._client()
+        if client is None or not scopes:
+            return
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for scope in scopes:
+                    version_key = self._version_key(scope)
+                    pipe.set(version_key, time.time_ns(), nx=True).incr(version_key)
+                    if self.write_marker_seconds:
+                        pipe.set(self._marker_key(scope), 1, px=int(self.write_marker_seconds * 1000))
+                await pipe.execute()
+        except RedisError as exc:
+            self._error("invalidation", exc)
+
+    def bump_version_sync(self, scope: str) -> None:
+        """Invalidate a scope from synchronous code such as Celery tasks."""
+        client = self._sync_client()
+        if client is None:
+            return
+        version_key = self._version_key(scope)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.set(version_key, time.time_ns(), nx=True).incr(version_key)
+            if self.write_marker_seconds:
+                pipe.set(self._marker_key(scope), 1, px=int(self.write_marker_seconds * 1000))
+            pipe.execute()
+        except RedisError as exc:
+            self._error("invalidation", exc)
+    
+    async def written_recently(self, scope: str) -> Optional[bool]:
+        """Whether the scope was bumped within write_marker_seconds; None if unknown."""
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            return bool(await client.exists(self._marker_key(scope)))
+        except RedisError as exc:
+            self._error("write marker lookup", exc)
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this cache."""
+        lookups = self.counters["local_hits"] + self.counters["redis_hits"] + self.counters["misses"]
+        hits = self.counters["local_hits"] + self.counters["redis_hits"]
+        return {
+            **self.counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "local_entries": len(self.local),
+        }
+
+
+def user_scope(user_id: int) -> str:
+    """Cache scope holding everything derived from one user's tasks."""
+    return f"user:{user_id}"
+
+
+task_cache = VersionedCache(
+    prefix="tasks",
+    redis=redis_client if settings.cache_enabled else None,
+    ttl_seconds=settings.cache_ttl_seconds,
+    local_ttl_seconds=settings.cache_local_ttl_seconds,
+    local_max_entries=settings.cache_local_max_entries,
+    write_marker_seconds=settings.read_replica_max_lag_seconds + settings.read_replica_check_seconds,
+)
@@ -1,5 +1,6 @@
 from celery import Celery
 from celery.schedules import crontab
+from datetime import timedelta
 from src.config import settings
 
 # Create Celery instance
@@ -37,6 +38,10 @@ celery_app.conf.beat_schedule = {
         "task": "src.tasks.celery_tasks.cleanup_old_tasks",
         "schedule": crontab(hour=2, minute=0),  # Run daily at 2 AM
     },
+    "schedule-task-reminders": {
+        "task": "src.tasks.celery_tasks.schedule_task_reminders",
+        "schedule": timedelta(minutes=settings.reminder_scan_interval_minutes),
+    },
 }
 
 if __name__ == "__main__":
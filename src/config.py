@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 import os
+from typing import List
 
 load_dotenv()
 
@@ -12,6 +13,20 @@ class Settings(BaseSettings):
     
     # Database settings
     database_url: str
+    # Optional override for the asyncio driver URL; derived from database_url when empty
+    database_async_url: str = ""
+    # Connection pool settings; database_null_pool disables pooling, e.g. behind PgBouncer
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30.0
+    database_pool_recycle: int = 1800
+    database_pool_pre_ping: bool = True
+    database_null_pool: bool = False
+    # Optional read replica for read-heavy queries; empty means read from the primary
+    database_read_url: str = ""
+    # Replicas further behind than this are skipped; lag is checked at most every read_replica_check_seconds
+    read_replica_max_lag_seconds: float = 5.0
+    read_replica_check_seconds: float = 5.0
     postgres_user: str = "user"
     postgres_password: str = "password"
     postgres_db: str = "taskdb"
@@ -21,14 +36,71 @@ class Settings(BaseSettings):
     # Redis settings
     redis_url: str = "redis://localhost:6379/0"
     
+    # Cache settings
+    cache_enabled: bool = True
+    cache_ttl_seconds: int = 300
+    cache_local_ttl_seconds: float = 2.0
+    cache_local_max_entries: int = 10000
+    principal_cache_ttl_seconds: int = 60
+    
     # Celery settings
     celery_broker_url: str = "redis://localhost:6379/0"
     celery_result_backend: str = "redis://localhost:6379/0"
     
+    # Task event stream settings
+    event_queue_size: int = 100
+    event_keepalive_seconds: int = 15
+    
+    # Bulk import settings
+    import_upload_dir: str = "uploads/imports"
+    import_chunk_size: int = 5000
+    import_max_reported_errors: int = 100
+    
+    # Completed task cleanup settings
+    cleanup_retention_days: int = 30
+    cleanup_batch_size: int = 1000
+    cleanup_batch_sleep_seconds: float = 0.5
+    # Deletion tombstones are kept this long for /tasks/changes; older syncs must start over
+    tombstone_retention_days: int = 90
+    
+    # Deadline reminder settings
+    reminder_window_hours: int = 24
+    reminder_scan_interval_minutes: int = 15
+    reminder_batch_size: int = 1000
+    
     # JWT settings
     jwt_secret_key: str
     jwt_algorithm: str = "HS256"
     jwt_access_token_expire_minutes: int = 30
+    jwt_refresh_token_expire_days: int = 14
+    
+    # Token revocation settings
+    revocation_bloom_capacity: int = 100000
+    revocation_bloom_error_rate: float = 0.001
+    revocation_resync_seconds: int = 300
+    
+    # Password hashing pool settings
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 64
+    # Processes used for bulk provisioning; 0 means one per CPU core
+    password_hash_processes: int = 0
+    
+    # Comma-separated usernames allowed to use admin endpoints
+    admin_usernames: str = ""
+    
+    # Prometheus metrics; set PROMETHEUS_MULTIPROC_DIR when running several workers
+    metrics_enabled: bool = True
+    
+    # Query accounting settings
+    query_stats_enabled: bool = True
+    slow_query_ms: float = 200.0
+    query_repeat_threshold: int = 10
+    
+    # Request profiling; empty profiling_secret keeps the profiler middleware out of the stack
+    profiling_secret: str = ""
+    profiling_interval_ms: float = 5.0
+    profiling_max_seconds: float = 30.0
+    profiling_dir: str = "profiles"
     
     # CORS settings
     cors_origins: str = "http://localhost:3000,http://localhost:8080"
@@ -44,4 +116,8 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
 
+    @property
+    def allowed_origins_list(self) -> List[str]:
+        return [origin.strip() for origin in self.cors_origins.split(",") if origin.strip()]
+
 settings = Settings()
@@ -1,36 +1,260 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import create_engine, event, inspect, text, update, BigInteger, Column, Integer, String, Boolean, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from sqlalchemy.sql import func
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Generator
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Generator, List, Optional, Tuple
+import asyncio
+import logging
+import time
 
 from .config import settings
 
+# Drivers used by the async engine for each sync database backend
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Translate a sync database URL into the equivalent asyncio driver URL."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+    return url.render_as_string(hide_password=False)
+
+
+class PoolMetrics:
+    """Checkout wait, usage and overflow counters for one engine's connection pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self.checkouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.connects = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def attach(self, engine) -> None:
+        """Listen to the pool events of a sync engine (or an async engine's sync_engine)."""
+        self.engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        self.connects += 1
+        # A QueuePool's overflow turns positive once it opens more than pool_size connections
+        overflow = getattr(self.engine.pool, "overflow", None)
+        if overflow is not None and overflow() > 0:
+            self.overflow_events += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        self.checkouts += 1
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        self.in_use = max(0, self.in_use - 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the counters along with the pool's current status."""
+        pool = self.engine.pool if self.engine is not None else None
+        return {
+            "pool": type(pool).__name__ if pool is not None else None,
+            "checkouts": self.checkouts,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "connects": self.connects,
+            "overflow_events": self.overflow_events,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 4),
+            "wait_seconds_max": round(self.wait_seconds_max, 4),
+            "status": pool.status() if pool is not None else None,
+        }
+
+
+def timed_pool_class(base, metrics: PoolMetrics):
+    """Subclass a pool class so every checkout records how long it waited for a connection."""
+
+    class TimedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                metrics.timeouts += 1
+                raise
+            finally:
+                metrics.record_wait(time.perf_counter() - started)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+# Pool metrics per engine, reported by /health/db
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def engine_options(database_url: str, name: str, is_async: bool = False) -> Dict[str, Any]:
+    """Build create_engine keyword arguments from the pool settings.
+
+    In NullPool mode every session opens and closes its own connection, which
+    leaves pooling to an external pooler such as PgBouncer. SQLite keeps the
+    pool its dialect picks, so only usage is recorded there.
+    """
+    metrics = pool_metrics[name] = PoolMetrics(name)
+    options: Dict[str, Any] = {"pool_pre_ping": settings.database_pool_pre_ping}
+    url = make_url(database_url)
+    if settings.database_null_pool:
+        options["poolclass"] = timed_pool_class(NullPool, metrics)
+        if url.get_driver_name() == "asyncpg":
+            # Prepared statements do not survive PgBouncer transaction pooling
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    elif url.get_backend_name() != "sqlite":
+        options.update(
+            poolclass=timed_pool_class(AsyncAdaptedQueuePool if is_async else QueuePool, metrics),
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            pool_recycle=settings.database_pool_recycle,
+        )
+    return options
+
+
+def create_instrumented_engine(database_url: str, name: str):
+    """Create a sync engine with the configured pool and its metrics attached."""
+    created = create_engine(database_url, **engine_options(database_url, name))
+    pool_metrics[name].attach(created)
+    return created
+
+
+def create_instrumented_async_engine(database_url: str, name: str):
+    """Create an async engine with the configured pool and its metrics attached."""
+    created = create_async_engine(database_url, **engine_options(database_url, name, is_async=True))
+    pool_metrics[name].attach(created.sync_engine)
+    return created
+
+
 # Database setup
-engine = create_engine(settings.database_url)
+engine = create_instrumented_engine(settings.database_url, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async database setup, used by the API so queries do not block the event loop
+async_engine = create_instrumented_async_engine(
+    settings.database_async_url or get_async_database_url(settings.database_url), "primary_async"
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+# Optional read replica, used for read-heavy queries while it keeps up with the primary
+async_read_engine = (
+    create_instrumented_async_engine(get_async_database_url(settings.database_read_url), "replica")
+    if settings.database_read_url else None
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_read_engine or async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds of replay lag on a Postgres standby; 0 when all received WAL is replayed
+REPLICA_LAG_SQL = {
+    "postgresql": """
+        SELECT CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+    """,
+}
+
+
+class ReplicaMonitor:
+    """Tracks whether the read replica is reachable and within the allowed lag.
+
+    The lag is probed at most once per check interval and the answer is shared by
+    every request in between. A failed probe marks the replica unusable until the
+    next one.
+    """
+
+    def __init__(self, engine, max_lag_seconds: float, check_seconds: float):
+        self.engine = engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self.lag_seconds: Optional[float] = None
+        self.usable = False
+        self._checked_at = float("-inf")
+
+    async def _probe(self) -> None:
+        statement = REPLICA_LAG_SQL.get(self.engine.dialect.name)
+        try:
+            async with self.engine.connect() as connection:
+                lag = await connection.scalar(text(statement)) if statement else 0
+            self.lag_seconds = float(lag or 0)
+            self.usable = self.lag_seconds <= self.max_lag_seconds
+            if not self.usable:
+                logger.warning(f"Read replica is {self.lag_seconds:.1f}s behind, reading from the primary")
+        except (SQLAlchemyError, OSError, asyncio.TimeoutError) as exc:
+            self.lag_seconds = None
+            self.usable = False
+            logger.warning(f"Read replica check failed, reading from the primary: {exc}")
+
+    async def is_usable(self) -> bool:
+        if self.engine is None:
+            return False
+        if time.monotonic() - self._checked_at >= self.check_seconds:
+            # Claim the check before awaiting so concurrent requests do not all probe
+            self._checked_at = time.monotonic()
+            await self._probe()
+        return self.usable
+
+
+replica_monitor = ReplicaMonitor(
+    async_read_engine,
+    max_lag_seconds=settings.read_replica_max_lag_seconds,
+    check_seconds=settings.read_replica_check_seconds,
+)
+
 
 # Database Models
 class User(Base):
     __tablename__ = "users"
-    
+
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    
+
     # Relationship
     tasks = relationship("TaskDB", back_populates="owner")
 
 
 class TaskDB(Base):
     __tablename__ = "tasks"
-    
+
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(String, nullable=True)
@@ -38,13 +262,200 @@ class TaskDB(Base):
     deadline = Column(DateTime, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
-    
+    # Position in the owner's change sequence, bumped on every write (see UserTaskState)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # When a deadline reminder was sent; cleared when the deadline changes
+    reminder_sent_at = Column(DateTime, nullable=True)
+
     # Foreign Key
     owner_id = Column(Integer, ForeignKey("users.id"))
-    
+
     # Relationship
     owner = relationship("User", back_populates="tasks")
 
+    __table_args__ = (
+        # Keyset pagination walks a user's tasks in id order
+        Index("ix_tasks_owner_id_id", "owner_id", "id"),
+        # List filters and sort orders
+        Index("ix_tasks_owner_completed_deadline", "owner_id", "completed", "deadline"),
+        Index("ix_tasks_owner_created_at_id", "owner_id", "created_at", "id"),
+        Index(
+            "ix_tasks_owner_pending_deadline",
+            "owner_id",
+            "deadline",
+            postgresql_where=(completed == False),
+            sqlite_where=(completed == False),
+        ),
+        # Delta sync reads a user's changes in sequence order
+        Index("ix_tasks_owner_change_seq", "owner_id", "change_seq"),
+        # Cleanup finds old completed tasks by their last update
+        Index(
+            "ix_tasks_completed_updated_at",
+            "updated_at",
+            postgresql_where=(completed == True),
+            sqlite_where=(completed == True),
+        ),
+        # The reminder scheduler scans upcoming deadlines of pending, unreminded tasks
+        Index(
+            "ix_tasks_reminder_due",
+            "deadline",
+            postgresql_where=(completed == False) & reminder_sent_at.is_(None),
+            sqlite_where=(completed == False) & reminder_sent_at.is_(None),
+        ),
+    )
+
+
+class UserTaskState(Base):
+    __tablename__ = "user_task_state"
+
+    # Last change sequence number handed out for the user's tasks
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Newest change sequence number among the user's pruned tombstones
+    pruned_change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Task counters maintained by every write; NULL until counted once (see TaskCRUD.get_stats)
+    total_count = Column(BigInteger, nullable=True)
+    completed_count = Column(BigInteger, nullable=True)
+
+
+class TaskTombstone(Base):
+    __tablename__ = "task_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_task_tombstones_owner_change_seq", "owner_id", "change_seq"),
+    )
+
+
+class TaskArchive(Base):
+    __tablename__ = "tasks_archive"
+
+    # Completed tasks moved out of tasks by cleanup, keyed by their original ID
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, nullable=True)
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    deadline = Column(DateTime, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+def reserve_change_seqs(dialect_name: str, owner_id: int, count: int = 1):
+    """Build a statement that reserves count change sequence numbers for a user.
+
+    It returns the last reserved number, so the range is (last - count, last].
+    The upsert locks the user's state row until commit, which keeps sequence
+    numbers in commit order. Reserve before touching task rows so every writer
+    takes its locks in the same order.
+    """
+    upsert = postgresql_insert if dialect_name == "postgresql" else sqlite_insert
+    statement = upsert(UserTaskState).values(owner_id=owner_id, change_seq=count)
+    return statement.on_conflict_do_update(
+        index_elements=[UserTaskState.owner_id],
+        set_={"change_seq": UserTaskState.change_seq + count},
+    ).returning(UserTaskState.change_seq)
+
+
+def adjust_task_counts(owner_id: int, total_delta: int = 0, completed_delta: int = 0):
+    """Build a statement applying deltas to a user's maintained task counters.
+
+    Counters that are still NULL stay NULL until they are backfilled.
+    """
+    return update(UserTaskState).where(UserTaskState.owner_id == owner_id).values(
+        total_count=UserTaskState.total_count + total_delta,
+        completed_count=UserTaskState.completed_count + completed_delta,
+    ).execution_options(synchronize_session=False)
+
+
+# Full-text search over task title and description. The search structures differ
+# per dialect, so they are maintained with DDL instead of mapped columns: a
+# trigger-maintained tsvector column with a GIN index on Postgres, and an
+# external-content FTS5 table kept in sync by triggers on SQLite. A generated
+# column would rewrite the whole tasks table when added, so it is avoided.
+SEARCH_CONFIG = "english"
+SEARCH_DOCUMENT_SQL = f"to_tsvector('{SEARCH_CONFIG}', coalesce({{row}}title, '') || ' ' || coalesce({{row}}description, ''))"
+
+TASK_SEARCH_DDL = {
+    "postgresql": [
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector",
+        f"""
+        CREATE OR REPLACE FUNCTION tasks_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_DOCUMENT_SQL.format(row="NEW.")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS tasks_search_vector_update ON tasks",
+        """
+        CREATE TRIGGER tasks_search_vector_update
+        BEFORE INSERT OR UPDATE OF title, description ON tasks
+        FOR EACH ROW EXECUTE FUNCTION tasks_search_vector_update()
+        """,
+    ],
+    "sqlite": [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts
+        USING fts5(title, description, content='tasks', content_rowid='id')
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """,
+    ],
+}
+
+# GIN index over the Postgres search vector, created after the vector is filled
+TASK_SEARCH_INDEX = "ix_tasks_search_vector ON tasks USING GIN (search_vector)"
+
+
+def search_vector_generated(connection) -> bool:
+    """Whether tasks.search_vector is the generated column of earlier releases, which needs no trigger."""
+    return connection.execute(text(
+        "SELECT is_generated = 'ALWAYS' FROM information_schema.columns "
+        "WHERE table_name = 'tasks' AND column_name = 'search_vector'"
+    )).scalar() is True
+
+
+def install_task_search(connection) -> None:
+    """Create the dialect-specific full-text search structures for tasks.
+
+    On Postgres this only sets up the column and its trigger; rows that predate
+    them are filled, and the GIN index built, by src.migrate.
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql" and search_vector_generated(connection):
+        return
+    statements = TASK_SEARCH_DDL.get(dialect, [])
+    needs_rebuild = dialect == "sqlite" and not inspect(connection).has_table("tasks_fts")
+    for statement in statements:
+        connection.execute(text(statement))
+    if needs_rebuild:
+        # Index rows that existed before the FTS table was created
+        connection.execute(text("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')"))
+
 
 # Database dependency
 def get_db() -> Generator[Session, None, None]:
@@ -55,6 +466,96 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+# Async database dependency
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@asynccontextmanager
+async def read_session(use_replica: bool = True) -> AsyncIterator[AsyncSession]:
+    """Open a session for reads, on the replica when allowed and healthy, else the primary.
+
+    Callers pass use_replica=False when the data may include writes the replica
+    has not replayed yet, such as the current user's own recent changes.
+    """
+    if use_replica and await replica_monitor.is_usable():
+        session_factory = AsyncReadSessionLocal
+    else:
+        session_factory = AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
+
+
+# Async read-only database dependency
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    async with read_session() as db:
+        yield db
+
+
+# Columns whose existing rows src.migrate fills in after create_tables adds them
+MIGRATED_COLUMNS = {("tasks", "change_seq")}
+
+
+def add_missing_columns(connection) -> List[Tuple[str, str]]:
+    """Add model columns missing from existing tables; returns the (table, column) pairs added.
+
+    create_all never alters existing tables, so new columns are added here.
+    Existing rows get the column default; backfilling real values is left to
+    src.migrate so no worker holds the table lock for a full-table UPDATE. On
+    Postgres the ALTER is safe to race with other workers starting up.
+    """
+    inspector = inspect(connection)
+    if_not_exists = " IF NOT EXISTS" if connection.dialect.name == "postgresql" else ""
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            default = f" DEFAULT {column.server_default.arg}" if column.server_default is not None else ""
+            connection.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN{if_not_exists} {column.name} {column_type}{default}"
+            ))
+            added.append((table.name, column.name))
+    return added
+
+
+def missing_indexes(connection) -> list:
+    """Model indexes that do not exist in the database yet."""
+    inspector = inspect(connection)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return missing
+
+
 # Create tables
 def create_tables():
+    """Create missing tables and columns.
+
+    New indexes and the search structures are only built here when the tasks
+    table is new, or on SQLite. Building them on an existing Postgres table
+    would block task traffic while every worker starts, so there they are left
+    to an online migration: python -m src.migrate.
+    """
+    with engine.connect() as connection:
+        tasks_existed = inspect(connection).has_table("tasks")
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        added = add_missing_columns(connection)
+        pending = [f"{table}.{column} backfill" for table, column in added if (table, column) in MIGRATED_COLUMNS]
+        if engine.dialect.name != "postgresql" or not tasks_existed:
+            for index in missing_indexes(connection):
+                index.create(bind=connection)
+            install_task_search(connection)
+            if engine.dialect.name == "postgresql":
+                connection.execute(text(f"CREATE INDEX IF NOT EXISTS {TASK_SEARCH_INDEX}"))
+        else:
+            pending.extend(index.name for index in missing_indexes(connection))
+            if "search_vector" not in {column["name"] for column in inspect(connection).get_columns("tasks")}:
+                pending.append("tasks.search_vector")
+    if pending:
+        logger.warning(f"Pending schema changes ({', '.join(pending)}); apply them with python -m src.migrate")
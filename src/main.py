@@ -1,68 +1,158 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+import logging
 from contextlib import asynccontextmanager
 
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.middleware.cors import CORSMiddleware
+
 from .config import settings
-from .database import create_tables
+from .auth import password_hasher, principal_cache
+from .cache import task_cache
+from .metrics import MetricsMiddleware, render_metrics
+from .profiling import ProfilingMiddleware
+from .query_stats import QueryStatsMiddleware, install_query_listeners, query_stats_report
+from .redis_client import redis_client
+from .revocation import token_revocations
+from .database import create_tables, async_engine, async_read_engine, pool_metrics, replica_monitor
 from .tasks.api import router as tasks_router
+from .tasks.events import task_events
 from .auth_api import router as auth_router
-from .assistant.api import router as assistant_router
-from .assistant.assistant_manager import assistant_manager
-
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup
-    create_tables()
-    
-    # Initialize assistants
-    try:
-        await assistant_manager.initialize_assistants()
-        print("✅ Assistants initialized successfully")
-    except Exception as e:
-        print(f"⚠️ Warning: Failed to initialize assistants: {e}")
-    
-    yield
-    # Shutdown
-    pass
-
-
-app = FastAPI(
-    title=settings.app_name,
-    version=settings.app_version,
-    description="A comprehensive Task Management API with JWT authentication",
-    lifespan=lifespan
-)
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.allowed_origins_list,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-@app.get("/", tags=["root"])
+
+logger = logging.getLogger(__name__)
+
+health_router = APIRouter()
+
+
+def create_app(include_assistant: bool = True) -> FastAPI:
+    """Build the API with its middlewares and lifespan.
+
+    include_assistant=False leaves out the assistant routes and their SDKs, for
+    example when benchmarking the task API.
+    """
+    assistant_manager = None
+    routers = [auth_router, tasks_router, health_router]
+    if include_assistant:
+        try:
+            from .assistant.api import router as assistant_router
+            from .assistant.assistant_manager import assistant_manager
+            routers.append(assistant_router)
+        except Exception as e:
+            logger.warning(f"Assistant routes disabled: {e}")
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Startup
+        create_tables()
+
+        # Initialize assistants
+        if assistant_manager is not None:
+            try:
+                await assistant_manager.initialize_assistants()
+                print("✅ Assistants initialized successfully")
+            except Exception as e:
+                print(f"⚠️ Warning: Failed to initialize assistants: {e}")
+
+        yield
+        # Shutdown
+        await task_events.close()
+        await token_revocations.close()
+        await redis_client.close()
+        await async_engine.dispose()
+        if async_read_engine is not None:
+            await async_read_engine.dispose()
+        password_hasher.shutdown()
+
+    app = FastAPI(
+        title=settings.app_name,
+        version=settings.app_version,
+        description="A comprehensive Task Management API with JWT authentication",
+        lifespan=lifespan
+    )
+
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.allowed_origins_list,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Resync-Since", "ETag", "Server-Timing", "X-Profile-File"],
+    )
+
+    # Per-request query counts, Server-Timing and N+1 warnings
+    if settings.query_stats_enabled:
+        install_query_listeners()
+        app.add_middleware(QueryStatsMiddleware)
+
+    # On-demand profiling of requests carrying a signed X-Profile header
+    if settings.profiling_secret:
+        app.add_middleware(ProfilingMiddleware)
+
+    # Prometheus request metrics, outermost so they time the whole stack
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware, router=app.router)
+
+    for router in routers:
+        app.include_router(router)
+    return app
+
+
+@health_router.get("/", tags=["root"])
 def read_root():
     """Root endpoint with API information."""
     return {
         "message": f"Welcome to {settings.app_name}",
         "version": settings.app_version,
         "docs": "/docs",
-        "redoc": "/redoc",
-        "legacy_greeting": f"Hello {settings.name}"
+        "redoc": "/redoc"
     }
 
 
-@app.get("/health", tags=["health"])
+@health_router.get("/health", tags=["health"])
 def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": settings.app_name}
 
 
-# Include routers
-app.include_router(auth_router)
-app.include_router(tasks_router)
-app.include_router(assistant_router)
+@health_router.get("/metrics", tags=["health"], include_in_schema=False)
+def metrics():
+    """Request metrics in the Prometheus text format."""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
+@health_router.get("/health/cache", tags=["health"])
+def cache_health():
+    """Cache hit/miss counters for this worker."""
+    return {
+        "tasks": task_cache.stats(),
+        "principals": principal_cache.stats(),
+        "revocations": token_revocations.stats(),
+    }
+
+
+@health_router.get("/health/db", tags=["health"])
+def database_health():
+    """Connection pool usage and checkout waits per engine for this worker."""
+    return {
+        "pools": {name: metrics.stats() for name, metrics in pool_metrics.items()},
+        "replica": {
+            "configured": async_read_engine is not None,
+            "usable": replica_monitor.usable,
+            "lag_seconds": replica_monitor.lag_seconds,
+        },
+    }
+
+
+@health_router.get("/health/queries", tags=["health"])
+def query_health():
+    """Query counts and database time per route for this worker."""
+    return query_stats_report()
+
+
+@health_router.get("/health/passwords", tags=["health"])
+def password_hasher_health():
+    """Password hashing pool queue depth and counters for this worker."""
+    return password_hasher.stats()
+
+
+app = create_app()
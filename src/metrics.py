@@ -0,0 +1,124 @@
+import glob
+import os
+import time
+from typing import Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client import multiprocess
+from starlette.routing import Match
+
+# Seconds; dense below one second, where the /tasks SLOs live
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests served",
+    ["method", "route", "status"],
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving an HTTP request to sending the end of its response",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+
+
+def multiprocess_enabled() -> bool:
+    """Whether metrics are shared between worker processes through PROMETHEUS_MULTIPROC_DIR."""
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Render every metric in the Prometheus text format, with its content type.
+
+    With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+    directory shared by all of them before they start; each worker then writes
+    its samples there and any worker can serve the combined view.
+    """
+    if multiprocess_enabled():
+        reap_dead_workers()
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def _process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def reap_dead_workers() -> None:
+    """Drop the live gauges of workers that are no longer running.
+    
+    uvicorn offers no child-exit hook, so before each scrape the PIDs behind the
+    live gauge files are checked instead; otherwise a crashed worker's
+    in-progress requests would stay in the sum. The workers share a host, as
+    PROMETHEUS_MULTIPROC_DIR already requires.
+    """
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    for path in glob.glob(os.path.join(directory, "gauge_live*_*.db")):
+        pid = os.path.basename(path)[:-len(".db")].rsplit("_", 1)[1]
+        if pid.isdigit() and not _process_running(int(pid)):
+            multiprocess.mark_process_dead(int(pid), directory)
+
+
+class MetricsMiddleware:
+    """Records latency, request count and in-flight requests per route template and status.
+
+    Routes are labelled by their template (e.g. /tasks/{task_id}) so label
+    cardinality stays bounded; paths that match no route share "unmatched".
+    """
+
+    def __init__(self, app, router):
+        self.app = app
+        self.router = router
+
+    def _route(self, scope) -> str:
+        partial: Optional[str] = None
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                partial = route.path
+        return partial or "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_PROGRESS.labels(method, route).inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_PROGRESS.labels(method, route).dec()
+            labels = (method, route, str(status_code))
+            REQUESTS.labels(*labels).inc()
+            LATENCY.labels(*labels).observe(time.perf_counter() - started)
@@ -0,0 +1,175 @@
+"""Online schema migration for an existing database.
+
+create_tables adds missing tables and columns at startup, but leaves the
+slow parts to this script, so they run without blocking task traffic:
+
+    python -m src.migrate [--batch-size 5000]
+
+On Postgres, new indexes are built with CREATE INDEX CONCURRENTLY, replacing
+any left invalid by an interrupted build, and the search vector is filled in
+batches, since its trigger only covers rows written after it was installed.
+On every database, tasks that predate change_seq are numbered in batches.
+Safe to run again.
+"""
+import argparse
+import logging
+import re
+import time
+from typing import Dict, List
+
+from sqlalchemy import Index, bindparam, select, text, update
+from sqlalchemy.schema import CreateIndex
+
+from .cache import task_cache, user_scope
+from .database import (
+    Base, SEARCH_DOCUMENT_SQL, TASK_SEARCH_INDEX, TaskDB, engine, install_task_search, missing_indexes,
+    reserve_change_seqs, search_vector_generated,
+)
+
+logger = logging.getLogger(__name__)
+
+# Session-level advisory lock held for the whole migration
+MIGRATION_LOCK_ID = 7_311_508
+
+INVALID_INDEXES_SQL = """
+SELECT index_class.relname
+FROM pg_index
+JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+JOIN pg_class table_class ON table_class.oid = pg_index.indrelid
+WHERE NOT pg_index.indisvalid
+  AND table_class.relname = ANY(:tables)
+  AND index_class.relname = ANY(:indexes)
+  AND index_class.relnamespace = to_regnamespace(current_schema())
+"""
+
+SEARCH_BACKFILL_SQL = f"""
+UPDATE tasks SET search_vector = {SEARCH_DOCUMENT_SQL.format(row="")}
+WHERE id IN (SELECT id FROM tasks WHERE search_vector IS NULL ORDER BY id LIMIT :batch_size)
+"""
+
+
+def create_index_concurrently(connection, index: Index) -> None:
+    statement = str(CreateIndex(index, if_not_exists=True).compile(dialect=connection.dialect))
+    connection.execute(text(re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", statement)))
+
+
+def managed_indexes() -> Dict[str, List[str]]:
+    """Index names this app creates, per table."""
+    indexes = {table.name: [index.name for index in table.indexes] for table in Base.metadata.sorted_tables}
+    indexes["tasks"].append(TASK_SEARCH_INDEX.split()[0])
+    return indexes
+
+
+def drop_invalid_indexes(connection) -> None:
+    """Drop this app's indexes left invalid by an interrupted concurrent build so they are rebuilt.
+
+    An index is also invalid while another session is still building it, so
+    this only runs under MIGRATION_LOCK_ID, which every migration holds.
+    """
+    indexes = managed_indexes()
+    names = connection.execute(text(INVALID_INDEXES_SQL), {
+        "tables": list(indexes), "indexes": [name for names in indexes.values() for name in names],
+    }).scalars()
+    for name in names:
+        logger.warning(f"Dropping invalid index {name}")
+        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+
+def backfill_search_vector(connection, batch_size: int) -> int:
+    """Fill the search vector of rows written before its trigger existed, one short transaction per batch."""
+    filled = 0
+    while True:
+        updated = connection.execute(text(SEARCH_BACKFILL_SQL), {"batch_size": batch_size}).rowcount
+        filled += updated
+        if updated < batch_size:
+            return filled
+        logger.info(f"Filled the search vector of {filled} tasks")
+
+
+def backfill_change_seqs(batch_size: int) -> int:
+    """Give tasks that predate change_seq a sequence number from their owner's counter.
+
+    Rows still at the column default of 0 are walked in id order, one short
+    transaction per batch. Numbers are reserved through user_task_state like
+    any writer does, locking owners in the same order, so they never collide
+    with numbers handed out by live writes.
+    """
+    filled = 0
+    after_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(TaskDB.id, TaskDB.owner_id)
+                .where(TaskDB.id > after_id, TaskDB.change_seq == 0, TaskDB.owner_id.is_not(None))
+                .order_by(TaskDB.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return filled
+            after_id = rows[-1].id
+
+            per_owner: Dict[int, List[int]] = {}
+            for row in rows:
+                per_owner.setdefault(row.owner_id, []).append(row.id)
+            for owner_id in sorted(per_owner):
+                task_ids = per_owner[owner_id]
+                last_seq = connection.execute(
+                    reserve_change_seqs(connection.dialect.name, owner_id, len(task_ids))
+                ).scalar_one()
+                first_seq = last_seq - len(task_ids) + 1
+                # A task written since the SELECT already has a number of its own
+                connection.execute(
+                    update(TaskDB)
+                    .where(TaskDB.id == bindparam("task_id"), TaskDB.change_seq == 0)
+                    .values(change_seq=bindparam("seq"))
+                    .execution_options(synchronize_session=False),
+                    [{"task_id": task_id, "seq": first_seq + index} for index, task_id in enumerate(task_ids)],
+                )
+        for owner_id in per_owner:
+            task_cache.bump_version_sync(user_scope(owner_id))
+        filled += len(rows)
+        logger.info(f"Numbered {filled} tasks for the change feed")
+
+
+def migrate_schema(connection, batch_size: int) -> None:
+    drop_invalid_indexes(connection)
+    for index in missing_indexes(connection):
+        logger.info(f"Building index {index.name}")
+        create_index_concurrently(connection, index)
+
+    if not search_vector_generated(connection):
+        install_task_search(connection)
+        filled = backfill_search_vector(connection, batch_size)
+        logger.info(f"Filled the search vector of {filled} tasks")
+    logger.info("Building the search index")
+    connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TASK_SEARCH_INDEX}"))
+
+
+def migrate(batch_size: int) -> None:
+    started = time.perf_counter()
+    if engine.dialect.name == "postgresql":
+        # Concurrent index builds cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            if not connection.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID}).scalar():
+                raise SystemExit("Another migration is running")
+            try:
+                migrate_schema(connection, batch_size)
+                backfill_change_seqs(batch_size)
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+    else:
+        # create_tables already builds indexes and search structures here
+        backfill_change_seqs(batch_size)
+    logger.info(f"Migration finished in {time.perf_counter() - started:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build new indexes and search structures online")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per backfill batch")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    migrate(args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+from redis.exceptions import RedisError
+from starlette.datastructures import MutableHeaders
+
+from .config import settings
+from .redis_client import RedisClient, redis_client
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_FILE_HEADER = "X-Profile-File"
+# Furthest in the future a signed profile header may expire, and the default lifetime
+MAX_SIGNATURE_LIFETIME = 300
+DEFAULT_SIGNATURE_LIFETIME = 60
+
+
+def sign_profile_request(method: str, path: str, expires: int) -> str:
+    """Build the X-Profile header value that authorizes profiling one method and path."""
+    message = f"{expires}:{method.upper()}:{path}".encode()
+    signature = hmac.new(settings.profiling_secret.encode(), message, hashlib.sha256).hexdigest()
+    return f"{expires}:{signature}"
+
+
+def verify_profile_header(value: str, method: str, path: str) -> bool:
+    """Check an X-Profile header against the request it came with."""
+    try:
+        expires = int(value.split(":", 1)[0])
+    except ValueError:
+        return False
+    if not 0 < expires - time.time() <= MAX_SIGNATURE_LIFETIME:
+        return False
+    return hmac.compare_digest(value, sign_profile_request(method, path, expires))
+
+
+class SignatureClaims:
+    """Records used profile signatures in Redis so each one profiles a single request."""
+
+    def __init__(self, redis: RedisClient, prefix: str = "profile:used"):
+        self.redis = redis
+        self.prefix = prefix
+
+    async def claim(self, header: str) -> bool:
+        """Mark a verified header as used; False if it was used before or Redis is unavailable."""
+        client = self.redis.get()
+        if client is None:
+            return False
+        expires, signature = header.split(":", 1)
+        ttl = max(1, int(expires) - int(time.time()) + 1)
+        try:
+            return bool(await client.set(f"{self.prefix}:{signature}", 1, ex=ttl, nx=True))
+        except RedisError as exc:
+            logger.warning(f"Could not record profile signature, not profiling: {exc}")
+            return False
+
+
+signature_claims = SignatureClaims(redis_client)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _await_chain(coro, request_frame) -> List[str]:
+    """Frames of a suspended coroutine chain from request_frame inwards."""
+    labels = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        if frame is request_frame:
+            labels.clear()
+        labels.append(_frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return labels
+
+
+class RequestSampler:
+    """Samples the stack of one request from a background thread.
+
+    When the event loop thread is running the request, its Python stack is
+    recorded. While the request is suspended, its await chain is recorded with
+    an "[awaiting]" leaf instead, so the profile covers wall-clock time spent
+    on database and network waits too. Samples from other requests sharing the
+    loop are skipped.
+    """
+
+    def __init__(self, request_frame, task: asyncio.Task, interval_seconds: float, max_seconds: float):
+        self.request_frame = request_frame
+        self.task = task
+        self.loop_thread_id = threading.get_ident()
+        self.interval_seconds = interval_seconds
+        self.max_seconds = max_seconds
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _running_stack(self) -> Optional[List[str]]:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            if frame is self.request_frame:
+                return labels[::-1]
+            frame = frame.f_back
+        return None
+
+    def _sample(self) -> None:
+        stack = self._running_stack()
+        if stack is None:
+            stack = _await_chain(self.task.get_coro(), self.request_frame) + ["[awaiting]"]
+        self.samples[";".join(stack)] += 1
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval_seconds) and time.monotonic() < deadline:
+            self._sample()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """Samples in the collapsed-stack format read by flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfilingMiddleware:
+    """Profiles single requests that carry a valid signed X-Profile header.
+
+    The header is "<expires>:<hmac>" as built by sign_profile_request, bound to
+    the request method and path, valid for at most MAX_SIGNATURE_LIFETIME
+    seconds and for one request only. A profiled request is sampled every
+    settings.profiling_interval_ms and its collapsed stacks are written to
+    settings.profiling_dir; the response names the file in X-Profile-File.
+    Requests without a usable header pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                header = value.decode("latin-1")
+                break
+        if header is None:
+            await self.app(scope, receive, send)
+            return
+        if not verify_profile_header(header, scope["method"], scope["path"]):
+            logger.warning(f"Rejected profile header for {scope['method']} {scope['path']}")
+            await self.app(scope, receive, send)
+            return
+        if not await signature_claims.claim(header):
+            logger.warning(f"Ignored reused profile header for {scope['method']} {scope['path']}")
+            await self.app(scope, receive, send)
+            return
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", scope["path"]).strip("-") or "root"
+        file_name = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{slug}-{os.getpid()}.collapsed"
+        path = os.path.join(settings.profiling_dir, file_name)
+
+        async def send_with_file(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(PROFILE_FILE_HEADER, file_name)
+            await send(message)
+
+        sampler = RequestSampler(
+            sys._getframe(),
+            asyncio.current_task(),
+            interval_seconds=settings.profiling_interval_ms / 1000,
+            max_seconds=settings.profiling_max_seconds,
+        )
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_file)
+        finally:
+            sampler.stop()
+            os.makedirs(settings.profiling_dir, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(sampler.collapsed())
+            logger.info(f"Profiled {scope['method']} {scope['path']}: {sum(sampler.samples.values())} samples in {path}")
+
+
+if __name__ == "__main__":
+    # Print a header that authorizes profiling one request, e.g.
+    #   python -m src.profiling GET /tasks/get_tasks
+    method, request_path = sys.argv[1], sys.argv[2]
+    print(f"X-Profile: {sign_profile_request(method, request_path, int(time.time()) + DEFAULT_SIGNATURE_LIFETIME)}")
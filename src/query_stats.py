@@ -0,0 +1,131 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RequestQueryStats:
+    """SQL statements run while serving one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Statements run at least threshold times, the usual sign of an N+1 query."""
+        return {statement: count for statement, count in self.statements.items() if count >= threshold}
+
+
+# Stats of the request being served in the current context, if any
+current_query_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_query_stats", default=None)
+
+# Totals per route template, reported by /health/queries
+route_query_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    if elapsed * 1000 >= settings.slow_query_ms:
+        logger.warning(f"Slow query ({elapsed * 1000:.1f} ms): {' '.join(statement.split())}")
+
+
+def _handle_error(exception_context) -> None:
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def install_query_listeners() -> None:
+    """Time every statement on every engine, sync or async."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+
+def route_name(scope: dict) -> str:
+    """Method and route template of a request, e.g. "GET /tasks/{task_id}"."""
+    route = scope.get("route")
+    path = getattr(route, "path", None) or "unmatched"
+    return f"{scope['method']} {path}"
+
+
+class QueryStatsMiddleware:
+    """Counts the queries and database time of each request.
+
+    The totals go out in a Server-Timing header and into per-route totals.
+    Statements repeated settings.query_repeat_threshold times or more within one
+    request are logged as likely N+1 queries. Queries of a streamed body that
+    run after the headers were sent are only counted in the route totals.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = current_query_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            self._finish(route_name(scope), stats)
+
+    def _finish(self, route: str, stats: RequestQueryStats) -> None:
+        totals = route_query_stats.setdefault(
+            route, {"requests": 0, "queries": 0, "db_seconds": 0.0, "max_queries": 0}
+        )
+        totals["requests"] += 1
+        totals["queries"] += stats.count
+        totals["db_seconds"] += stats.seconds
+        totals["max_queries"] = max(totals["max_queries"], stats.count)
+
+        for statement, count in stats.repeated(settings.query_repeat_threshold).items():
+            logger.warning(f"{route} ran the same statement {count} times: {' '.join(statement.split())}")
+
+
+def query_stats_report() -> Dict[str, Dict[str, Any]]:
+    """Per-route query totals with averages."""
+    return {
+        route: {
+            **totals,
+            "db_seconds": round(totals["db_seconds"], 4),
+            "avg_queries": round(totals["queries"] / totals["requests"], 2),
+        }
+        for route, totals in sorted(route_query_stats.items())
+    }
@@ -0,0 +1,52 @@
+from typing import Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from .config import settings
+
+
+class RedisClient:
+    """The Redis clients of one process, created on first use.
+
+    Caches, the revocation list, the event broker and the profiler all take
+    this object instead of a URL, so a worker holds one connection pool per
+    client type rather than one per component.
+    """
+
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self._async: Optional[aioredis.Redis] = None
+        self._sync: Optional[redis.Redis] = None
+
+    def get(self) -> Optional[aioredis.Redis]:
+        """The asyncio client, or None when no Redis URL is configured."""
+        if not self.redis_url:
+            return None
+        if self._async is None:
+            self._async = aioredis.from_url(self.redis_url, decode_responses=True)
+        return self._async
+
+    def get_sync(self) -> Optional[redis.Redis]:
+        """The blocking client for synchronous code such as Celery tasks."""
+        if not self.redis_url:
+            return None
+        if self._sync is None:
+            self._sync = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        return self._sync
+
+    def use(self, client: Optional[aioredis.Redis], sync_client: Optional[redis.Redis] = None) -> None:
+        """Replace the clients, for example with in-memory fakes in tests."""
+        self._async = client
+        self._sync = sync_client
+
+    async def close(self) -> None:
+        if self._async is not None:
+            await self._async.close()
+            self._async = None
+        if self._sync is not None:
+            self._sync.close()
+            self._sync = None
+
+
+redis_client = RedisClient(settings.redis_url)
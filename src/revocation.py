@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Dict, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from .config import settings
+from .redis_client import RedisClient, redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings, sized for a capacity and false positive rate."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for index in range(self.hash_count):
+            yield (first + index * second) % self.size
+
+    def add(self, item: str) -> None:
+        if item in self:
+            return
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenRevocationList:
+    """Revoked token IDs kept in Redis, fronted by an in-process bloom filter.
+
+    Each revoked jti is stored as a Redis key that expires with the token, so
+    the list never outgrows the tokens still in circulation. Every worker
+    mirrors the list into a bloom filter, filled by a SCAN and kept current
+    through a pub/sub channel, so checking a token that was never revoked does
+    not leave the process. Only bloom hits are confirmed against Redis. The
+    filter is rebuilt periodically to shed expired entries, and until it has
+    been built every check goes to Redis.
+
+    If Redis is unreachable, checks fail open: revoked tokens are then only
+    stopped by their own expiry.
+    """
+
+    def __init__(
+        self,
+        redis: RedisClient,
+        capacity: int,
+        error_rate: float,
+        resync_seconds: int,
+        prefix: str = "auth:revoked"
+    ):
+        self.redis = redis
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.resync_seconds = resync_seconds
+        self.prefix = prefix
+        self.channel = "auth:revocations"
+        self.bloom: Optional[BloomFilter] = None
+        self._listener: Optional[asyncio.Task] = None
+        self.counters: Dict[str, int] = {
+            "local_passes": 0,
+            "redis_checks": 0,
+            "revoked_hits": 0,
+            "errors": 0,
+        }
+
+    def _key(self, jti: str) -> str:
+        return f"{self.prefix}:{jti}"
+
+    async def revoke(self, jti: str, expires_at: int) -> bool:
+        """Revoke a token until it expires.
+
+        Returns False if it was already revoked, which makes revoking a single-use
+        token an atomic claim. Raises RedisError if Redis is unavailable.
+        """
+        client = self.redis.get()
+        if client is None:
+            raise RedisError("Token revocation requires Redis")
+        ttl = max(1, int(expires_at - time.time()))
+        revoked = await client.set(self._key(jti), 1, ex=ttl, nx=True)
+        if self.bloom is not None:
+            self.bloom.add(jti)
+        if revoked:
+            await client.publish(self.channel, jti)
+        return bool(revoked)
+
+    async def is_revoked(self, jti: str) -> bool:
+        """Check whether a token has been revoked."""
+        client = self.redis.get()
+        if client is None:
+            return False
+        self._ensure_listener()
+        if self.bloom is not None and jti not in self.bloom:
+            self.counters["local_passes"] += 1
+            return False
+
+        self.counters["redis_checks"] += 1
+        try:
+            revoked = bool(await client.exists(self._key(jti)))
+        except RedisError as exc:
+            self.counters["errors"] += 1
+            logger.warning(f"Token revocation check failed: {exc}")
+            return False
+        if revoked:
+            self.counters["revoked_hits"] += 1
+        return revoked
+
+    def _ensure_listener(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _rebuild(self, client: aioredis.Redis) -> None:
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        async for key in client.scan_iter(match=f"{self.prefix}:*", count=1000):
+            bloom.add(key[len(self.prefix) + 1:])
+        if bloom.count > self.capacity:
+            logger.warning(f"{bloom.count} revoked tokens exceed the bloom filter capacity of {self.capacity}")
+        self.bloom = bloom
+
+    async def _listen(self) -> None:
+        """Keep the bloom filter in sync with Redis, rebuilding it after any gap."""
+        while True:
+            client = self.redis.get()
+            pubsub = client.pubsub()
+            try:
+                # Subscribe before scanning so no revocation falls in between
+                await pubsub.subscribe(self.channel)
+                await self._rebuild(client)
+                rebuilt_at = time.monotonic()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None and message["type"] == "message":
+                        self.bloom.add(message["data"])
+                    if time.monotonic() - rebuilt_at > self.resync_seconds:
+                        await self._rebuild(client)
+                        rebuilt_at = time.monotonic()
+            except RedisError as exc:
+                self.bloom = None
+                self.counters["errors"] += 1
+                logger.warning(f"Token revocation sync lost, retrying: {exc}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return check counters and the size of the local filter."""
+        return {
+            **self.counters,
+            "bloom_ready": self.bloom is not None,
+            "bloom_entries": self.bloom.count if self.bloom is not None else 0,
+        }
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+
+token_revocations = TokenRevocationList(
+    redis=redis_client,
+    capacity=settings.revocation_bloom_capacity,
+    error_rate=settings.revocation_bloom_error_rate,
+    resync_seconds=settings.revocation_resync_seconds,
+)
@@ -1,56 +1,415 @@
-from typing import List
+import asyncio
+import csv
+import io
+import json
+import os
+import uuid
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+import aiofiles
+from celery.result import AsyncResult
+from fastapi import APIRouter, Depends, HTTPException, status, File, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth import get_current_active_user
-from ..database import get_db, User
-from .crud import TaskCRUD
-from .models import Task, TaskCreate, TaskUpdate
+from ..cache import task_cache, user_scope
+from ..celery_app import celery_app
+from ..config import settings
+from ..database import get_async_db, read_session, async_read_engine, AsyncSessionLocal, TaskDB
+from .celery_tasks import process_bulk_tasks
+from .crud import TaskCRUD, encode_cursor, decode_cursor
+from .events import task_events
+from .models import (
+    Task, TaskCreate, TaskUpdate, TaskFilter, TaskSort, TaskFileFormat,
+    TaskBulkCreate, TaskBulkUpdate, TaskBulkDelete,
+    TaskBulkResult, TaskBulkDeleteResult, BulkItemError, TaskImportJob,
+    TaskChanges, TaskDeletion, TaskStats, User,
+)
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+RESYNC_SINCE_HEADER = "X-Resync-Since"
+
+# Columns written by /tasks/export, and how many rows go into each streamed chunk
+EXPORT_FIELDS = ["id", "title", "description", "completed", "deadline", "created_at", "updated_at"]
+EXPORT_CHUNK_ROWS = 500
+EXPORT_MEDIA_TYPES = {
+    TaskFileFormat.NDJSON: "application/x-ndjson",
+    TaskFileFormat.CSV: "text/csv",
+}
+IMPORT_READ_BYTES = 1024 * 1024
+
+
+async def get_task_read_db(
+    current_user: User = Depends(get_current_active_user)
+) -> AsyncIterator[AsyncSession]:
+    """Read session for the current user's tasks.
+    
+    It uses the read replica, if there is one, unless the user changed their tasks
+    recently, so users read their own writes. Without a replica the write marker
+    is not looked up at all.
+    """
+    use_replica = False
+    if async_read_engine is not None:
+        use_replica = await task_cache.written_recently(user_scope(current_user.id)) is False
+    async with read_session(use_replica=use_replica) as db:
+        yield db
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    user_id: int,
+    change_seq: int,
+    key: str
+) -> Optional[Response]:
+    """Tag a read with the user's change sequence, answering 304 if the client is current.
+    
+    The ETag comes from the user's durable change sequence, which every task
+    mutation advances in the same transaction, so it changes with the data even
+    when a cache version bump is lost to a Redis error.
+    """
+    etag = f'W/"{user_id}.{change_seq}.{zlib.crc32(key.encode()):08x}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def serialize_task(task: TaskDB) -> dict:
+    """Convert a task row into the JSON-ready form stored in the cache."""
+    return Task.model_validate(task).model_dump(mode="json")
+
+
+def task_filter_params(
+    completed: Optional[bool] = Query(None, description="Only completed (true) or pending (false) tasks"),
+    deadline_before: Optional[datetime] = Query(None, description="Only tasks due before this time"),
+    deadline_after: Optional[datetime] = Query(None, description="Only tasks due after this time"),
+    created_after: Optional[datetime] = Query(None, description="Only tasks created after this time"),
+    sort: TaskSort = Query(TaskSort.ID, description="Sort field; prefix with '-' for descending order")
+) -> TaskFilter:
+    """Collect task list filters from query parameters."""
+    return TaskFilter(
+        completed=completed,
+        deadline_before=deadline_before,
+        deadline_after=deadline_after,
+        created_after=created_after,
+        sort=sort,
+    )
+
+
+async def list_user_tasks(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    user_id: int,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    filters: TaskFilter
+) -> Union[Response, List[dict]]:
+    """Load one page of a user's tasks and expose the next cursor as a header."""
+    after = decode_cursor(cursor, filters.sort) if cursor else None
+    # Read the sequence before the rows, so a page is never older than the key it is cached under
+    change_seq = await TaskCRUD.get_change_seq(db, user_id)
+    key = f"list:{change_seq}:{skip}:{limit}:{cursor or ''}:{filters.model_dump_json()}"
+    not_modified = check_not_modified(request, response, user_id, change_seq, key)
+    if not_modified:
+        return not_modified
+    
+    async def load_page() -> dict:
+        tasks = await TaskCRUD.get_tasks_by_user(db, user_id, skip, limit, after, filters)
+        next_cursor = encode_cursor(tasks[-1], filters.sort) if len(tasks) == limit else None
+        return {"items": [serialize_task(task) for task in tasks], "next_cursor": next_cursor}
+    
+    page = await task_cache.get_or_load(user_scope(user_id), key, load_page)
+    if page["next_cursor"]:
+        response.headers[NEXT_CURSOR_HEADER] = page["next_cursor"]
+    return page["items"]
+
+
+async def export_rows(user_id: int, export_format: TaskFileFormat) -> AsyncIterator[str]:
+    """Stream a user's tasks as NDJSON or CSV text chunks.
+    
+    The generator opens its own session because it keeps reading after the
+    request's dependencies have been torn down.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == TaskFileFormat.CSV:
+        writer.writerow(EXPORT_FIELDS)
+    rows = 0
+    
+    async with AsyncSessionLocal() as db:
+        async for task in TaskCRUD.stream_tasks_by_user(db, user_id):
+            row = serialize_task(task)
+            if export_format == TaskFileFormat.CSV:
+                writer.writerow([row[field] for field in EXPORT_FIELDS])
+            else:
+                buffer.write(json.dumps({field: row[field] for field in EXPORT_FIELDS}))
+                buffer.write("\n")
+            rows += 1
+            if rows % EXPORT_CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
 
 @router.post("/create", response_model=Task, status_code=status.HTTP_201_CREATED)
 async def create_task(
     task_data: TaskCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new task for the current user."""
-    return TaskCRUD.create_task(db, task_data, current_user.id)
+    return await TaskCRUD.create_task(db, task_data, current_user.id)
 
 
 @router.get("/get_tasks", response_model=List[Task])
 async def get_tasks(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0, description="Number of tasks to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of tasks to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    filters: TaskFilter = Depends(task_filter_params),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_task_read_db)
 ):
     """Get all tasks for the current user."""
-    return TaskCRUD.get_tasks_by_user(db, current_user.id, skip, limit)
+    return await list_user_tasks(request, response, db, current_user.id, skip, limit, cursor, filters)
 
 
 @router.get("/get_all", response_model=List[Task])
 async def get_all_tasks(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0, description="Number of tasks to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of tasks to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    filters: TaskFilter = Depends(task_filter_params),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_task_read_db)
 ):
     """Get all tasks for the current user (alias for get_tasks)."""
-    return TaskCRUD.get_tasks_by_user(db, current_user.id, skip, limit)
+    return await list_user_tasks(request, response, db, current_user.id, skip, limit, cursor, filters)
+
+
+@router.get("/export")
+async def export_tasks(
+    export_format: TaskFileFormat = Query(TaskFileFormat.NDJSON, alias="format", description="ndjson or csv"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream every task of the current user as NDJSON or CSV."""
+    return StreamingResponse(
+        export_rows(current_user.id, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{export_format.value}"'},
+    )
+
+
+@router.post("/import", response_model=TaskImportJob, status_code=status.HTTP_202_ACCEPTED)
+async def import_tasks(
+    file: UploadFile = File(..., description="CSV with a header row, or NDJSON with one task per line"),
+    file_format: TaskFileFormat = Query(TaskFileFormat.NDJSON, alias="format", description="ndjson or csv"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Upload a task file and import it in the background."""
+    os.makedirs(settings.import_upload_dir, exist_ok=True)
+    path = os.path.join(settings.import_upload_dir, f"{uuid.uuid4().hex}.{file_format.value}")
+    async with aiofiles.open(path, "wb") as upload:
+        while chunk := await file.read(IMPORT_READ_BYTES):
+            await upload.write(chunk)
+    
+    job = await run_in_threadpool(process_bulk_tasks.delay, path, current_user.id, file_format.value)
+    return TaskImportJob(job_id=job.id, state="PENDING")
+
+
+@router.get("/import/{job_id}", response_model=TaskImportJob)
+async def get_import_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Report the state and progress of a task import."""
+    result = AsyncResult(job_id, app=celery_app)
+    state = await run_in_threadpool(lambda: result.state)
+    info = await run_in_threadpool(lambda: result.info)
+    progress = info if isinstance(info, dict) else None
+    if progress is not None and progress.get("user_id") != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import job not found"
+        )
+    return TaskImportJob(job_id=job_id, state=state, progress=progress)
+
+
+@router.get("/stats", response_model=TaskStats)
+async def get_task_stats(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get total, completed, pending and overdue task counts for the current user."""
+    return await TaskCRUD.get_stats(db, current_user.id)
+
+
+@router.get("/stream")
+async def stream_task_events(
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Server-sent events for changes to the current user's tasks.
+    
+    Each event carries the change_seq it brings the user to, so a client that
+    reconnects can catch up with /tasks/changes.
+    """
+    user_id = current_user.id
+    
+    async def event_source() -> AsyncIterator[str]:
+        async with task_events.subscribe(user_id) as queue:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.event_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event['change_seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/changes", response_model=TaskChanges)
+async def get_task_changes(
+    since: int = Query(0, ge=0, description="next_since from the previous sync; 0 for a full sync"),
+    limit: int = Query(500, ge=1, le=1000, description="Maximum number of changes to return"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the tasks changed and deleted since a previous sync.
+    
+    Tombstones are pruned after settings.tombstone_retention_days. If some
+    newer than since are gone, this answers 410 Gone: the client must replace
+    its tasks with a full listing from /tasks/get_tasks, then sync from the
+    since given in the X-Resync-Since header.
+    """
+    tasks, tombstones, has_more = await TaskCRUD.get_changes(db, current_user.id, since, limit)
+    # Checked after reading, so a prune committed in between is still noticed
+    pruned_seq, change_seq = await TaskCRUD.get_sync_horizon(db, current_user.id)
+    if since < pruned_seq:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Deletions since this sync are no longer kept; list all tasks, then sync from X-Resync-Since",
+            headers={RESYNC_SINCE_HEADER: str(change_seq)},
+        )
+    seqs = [task.change_seq for task in tasks] + [tombstone.change_seq for tombstone in tombstones]
+    return TaskChanges(
+        changed=tasks,
+        deleted=[
+            TaskDeletion(id=tombstone.id, change_seq=tombstone.change_seq, deleted_at=tombstone.deleted_at)
+            for tombstone in tombstones
+        ],
+        next_since=max(seqs, default=since),
+        has_more=has_more,
+    )
+
+
+@router.get("/search", response_model=List[Task])
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms"),
+    skip: int = Query(0, ge=0, description="Number of results to skip"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of results to return"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Full-text search over the current user's task titles and descriptions."""
+    return await TaskCRUD.search_tasks(db, current_user.id, q, skip, limit)
+
+
+@router.post("/bulk", response_model=TaskBulkResult, status_code=status.HTTP_201_CREATED)
+async def bulk_create_tasks(
+    payload: TaskBulkCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create a batch of tasks in a single statement."""
+    tasks = await TaskCRUD.bulk_create_tasks(db, payload.tasks, current_user.id)
+    return TaskBulkResult(tasks=tasks)
+
+
+@router.patch("/bulk", response_model=TaskBulkResult)
+async def bulk_update_tasks(
+    payload: TaskBulkUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update a batch of tasks in a single transaction."""
+    tasks, errors = await TaskCRUD.bulk_update_tasks(db, payload.tasks, current_user.id)
+    return TaskBulkResult(tasks=tasks, errors=errors)
+
+
+@router.post("/bulk/delete", response_model=TaskBulkDeleteResult)
+async def bulk_delete_tasks(
+    payload: TaskBulkDelete,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete a batch of tasks in a single statement."""
+    deleted = await TaskCRUD.bulk_delete_tasks(db, payload.ids, current_user.id)
+    deleted_ids = set(deleted)
+    errors = [
+        BulkItemError(index=index, id=task_id, detail="Task not found")
+        for index, task_id in enumerate(payload.ids)
+        if task_id not in deleted_ids
+    ]
+    return TaskBulkDeleteResult(deleted_ids=deleted, errors=errors)
 
 
 @router.get("/{task_id}", response_model=Task)
 async def get_task(
     task_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_task_read_db)
 ):
     """Get a specific task by ID."""
-    task = TaskCRUD.get_task_by_id(db, task_id, current_user.id)
+    change_seq = await TaskCRUD.get_change_seq(db, current_user.id)
+    key = f"task:{change_seq}:{task_id}"
+    not_modified = check_not_modified(request, response, current_user.id, change_seq, key)
+    if not_modified:
+        return not_modified
+    
+    async def load_task() -> Optional[dict]:
+        task = await TaskCRUD.get_task_by_id(db, task_id, current_user.id)
+        return serialize_task(task) if task else None
+    
+    task = await task_cache.get_or_load(user_scope(current_user.id), key, load_task)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -64,10 +423,10 @@ async def update_task(
     task_id: int,
     task_update: TaskUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a specific task."""
-    task = TaskCRUD.update_task(db, task_id, task_update, current_user.id)
+    task = await TaskCRUD.update_task(db, task_id, task_update, current_user.id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -80,10 +439,10 @@ async def update_task(
 async def delete_task(
     task_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a specific task."""
-    success = TaskCRUD.delete_task(db, task_id, current_user.id)
+    success = await TaskCRUD.delete_task(db, task_id, current_user.id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -96,11 +455,11 @@ async def delete_task(
 async def mark_task_complete(
     task_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark a task as completed."""
     task_update = TaskUpdate(completed=True)
-    task = TaskCRUD.update_task(db, task_id, task_update, current_user.id)
+    task = await TaskCRUD.update_task(db, task_id, task_update, current_user.id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -113,11 +472,11 @@ async def mark_task_complete(
 async def mark_task_incomplete(
     task_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark a task as incomplete."""
     task_update = TaskUpdate(completed=False)
-    task = TaskCRUD.update_task(db, task_id, task_update, current_user.id)
+    task = await TaskCRUD.update_task(db, task_id, task_update, current_user.id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
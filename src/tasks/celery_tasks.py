@@ -1,36 +1,160 @@
 from celery import current_app as celery_app
 from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple, Union
+from pydantic import ValidationError
+from sqlalchemy import and_, delete, insert, select, update
 from sqlalchemy.orm import Session
-from src.database import get_db, TaskDB
+from src.cache import task_cache, user_scope
+from src.database import (
+    engine, User, TaskDB, TaskArchive, TaskTombstone, UserTaskState, reserve_change_seqs, adjust_task_counts,
+)
 from src.config import settings
+from src.tasks.events import task_events
+from src.tasks.models import TaskImportRow
+import csv
+import io
 import logging
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
+ARCHIVE_COLUMNS = ["id", "owner_id", "title", "description", "deadline", "created_at", "updated_at"]
+
+
+def _cleanup_batch(cutoff_date: datetime) -> Tuple[int, int]:
+    """Archive and delete one batch of old completed tasks.
+    
+    Returns the number of candidate rows read and the number deleted.
+    """
+    old_completed = and_(TaskDB.completed == True, TaskDB.updated_at < cutoff_date)
+    with engine.begin() as connection:
+        candidates = connection.execute(
+            select(TaskDB.id, TaskDB.owner_id)
+            .where(old_completed)
+            .order_by(TaskDB.updated_at)
+            .limit(settings.cleanup_batch_size)
+        ).all()
+        if not candidates:
+            return 0, 0
+        
+        per_owner: Dict[int, int] = {}
+        for row in candidates:
+            if row.owner_id is not None:
+                per_owner[row.owner_id] = per_owner.get(row.owner_id, 0) + 1
+        
+        # Lock owners' state rows before any task rows, in the same order as API
+        # writers, so the batch cannot change under us or deadlock with them
+        first_seqs = {}
+        for owner_id in sorted(per_owner):
+            last_seq = connection.execute(
+                reserve_change_seqs(connection.dialect.name, owner_id, per_owner[owner_id])
+            ).scalar_one()
+            first_seqs[owner_id] = last_seq - per_owner[owner_id] + 1
+        
+        batch = and_(TaskDB.id.in_([row.id for row in candidates]), old_completed)
+        connection.execute(
+            insert(TaskArchive).from_select(
+                ARCHIVE_COLUMNS,
+                select(*(TaskDB.__table__.c[name] for name in ARCHIVE_COLUMNS)).where(batch)
+            )
+        )
+        deleted = connection.execute(
+            delete(TaskDB).where(batch).returning(TaskDB.id, TaskDB.owner_id)
+        ).all()
+        
+        deleted_by_owner: Dict[int, List[int]] = {}
+        for row in deleted:
+            if row.owner_id is not None:
+                deleted_by_owner.setdefault(row.owner_id, []).append(row.id)
+        tombstones = []
+        for owner_id, task_ids in deleted_by_owner.items():
+            tombstones.extend(
+                {"task_id": task_id, "owner_id": owner_id, "change_seq": first_seqs[owner_id] + index}
+                for index, task_id in enumerate(task_ids)
+            )
+            connection.execute(adjust_task_counts(
+                owner_id, total_delta=-len(task_ids), completed_delta=-len(task_ids)
+            ))
+        if tombstones:
+            connection.execute(insert(TaskTombstone), tombstones)
+    
+    for owner_id, task_ids in deleted_by_owner.items():
+        task_cache.bump_version_sync(user_scope(owner_id))
+        task_events.publish_sync(owner_id, {
+            "type": "deleted",
+            "task_ids": task_ids,
+            "change_seq": first_seqs[owner_id] + len(task_ids) - 1,
+        })
+    return len(candidates), len(deleted)
+
+
+def _prune_tombstones_batch(cutoff_date: datetime) -> int:
+    """Delete one batch of tombstones older than the retention horizon; returns how many.
+    
+    Each owner's pruned_change_seq is raised to the newest sequence number
+    pruned, so /tasks/changes can send clients that synced before it to a full
+    resync instead of silently missing those deletions.
+    """
+    with engine.begin() as connection:
+        pruned = connection.execute(
+            delete(TaskTombstone)
+            .where(TaskTombstone.id.in_(
+                select(TaskTombstone.id)
+                .where(TaskTombstone.deleted_at < cutoff_date)
+                .order_by(TaskTombstone.id)
+                .limit(settings.cleanup_batch_size)
+            ))
+            .returning(TaskTombstone.owner_id, TaskTombstone.change_seq)
+        ).all()
+        
+        newest: Dict[int, int] = {}
+        for row in pruned:
+            newest[row.owner_id] = max(newest.get(row.owner_id, 0), row.change_seq)
+        for owner_id in sorted(newest):
+            connection.execute(
+                update(UserTaskState)
+                .where(UserTaskState.owner_id == owner_id, UserTaskState.pruned_change_seq < newest[owner_id])
+                .values(pruned_change_seq=newest[owner_id])
+            )
+    return len(pruned)
+
+
 @celery_app.task(bind=True)
 def cleanup_old_tasks(self):
     """
-    Clean up completed tasks older than 30 days
+    Archive and clean up completed tasks older than settings.cleanup_retention_days
+    
+    Rows are copied to tasks_archive and deleted by primary key in batches of
+    settings.cleanup_batch_size, each in its own short transaction, sleeping
+    settings.cleanup_batch_sleep_seconds between batches to bound lock time
+    and WAL bursts. Deletions are recorded as tombstones for delta sync, and
+    tombstones older than settings.tombstone_retention_days are pruned the
+    same way.
     """
+    cutoff_date = datetime.utcnow() - timedelta(days=settings.cleanup_retention_days)
+    tombstone_cutoff = datetime.utcnow() - timedelta(days=settings.tombstone_retention_days)
+    deleted_count = 0
+    pruned_count = 0
     try:
-        db = next(get_db())
-        cutoff_date = datetime.utcnow() - timedelta(days=30)
-        
-        # Delete old completed tasks
-        deleted_count = db.query(TaskDB).filter(
-            TaskDB.completed == True,
-            TaskDB.updated_at < cutoff_date
-        ).delete()
-        
-        db.commit()
-        logger.info(f"Cleaned up {deleted_count} old completed tasks")
-        return {"deleted_count": deleted_count, "status": "success"}
-        
+        while True:
+            candidates, deleted = _cleanup_batch(cutoff_date)
+            deleted_count += deleted
+            if candidates < settings.cleanup_batch_size:
+                break
+            time.sleep(settings.cleanup_batch_sleep_seconds)
+        while True:
+            pruned = _prune_tombstones_batch(tombstone_cutoff)
+            pruned_count += pruned
+            if pruned < settings.cleanup_batch_size:
+                break
+            time.sleep(settings.cleanup_batch_sleep_seconds)
     except Exception as exc:
         logger.error(f"Error cleaning up old tasks: {str(exc)}")
         raise self.retry(exc=exc, countdown=60, max_retries=3)
-    finally:
-        db.close()
+    
+    logger.info(f"Cleaned up {deleted_count} old completed tasks and {pruned_count} tombstones")
+    return {"deleted_count": deleted_count, "pruned_tombstones": pruned_count, "status": "success"}
 
 @celery_app.task(bind=True)
 def send_task_reminder(self, task_id: int, user_email: str):
@@ -48,24 +172,194 @@ def send_task_reminder(self, task_id: int, user_email: str):
         raise self.retry(exc=exc, countdown=60, max_retries=3)
 
 @celery_app.task(bind=True)
-def process_bulk_tasks(self, task_data_list: list):
+def send_task_reminders(self, user_email: str, task_ids: List[int]):
     """
-    Process multiple tasks in bulk
+    Send one reminder covering several upcoming task deadlines of a user
     """
     try:
-        db = next(get_db())
-        processed_count = 0
+        # This would integrate with an email service
+        # For now, just log the reminder
+        logger.info(f"Reminder: {len(task_ids)} task deadlines approaching for {user_email}: {task_ids}")
+        return {"task_ids": task_ids, "user_email": user_email, "status": "reminder_sent"}
         
-        for task_data in task_data_list:
-            # Process each task
-            # This is a placeholder for bulk task processing logic
-            processed_count += 1
+    except Exception as exc:
+        logger.error(f"Error sending task reminders: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60, max_retries=3)
+
+@celery_app.task(bind=True)
+def schedule_task_reminders(self):
+    """
+    Queue reminders for pending tasks whose deadline falls within the reminder window
+    
+    Run periodically by beat. Due tasks are read in batches over the
+    ix_tasks_reminder_due partial index and marked as reminded in the same
+    transaction, so overlapping or repeated runs never remind twice. Reminders
+    are grouped into one send_task_reminders call per user and batch.
+    """
+    now = datetime.utcnow()
+    window_end = now + timedelta(hours=settings.reminder_window_hours)
+    reminded = 0
+    
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(TaskDB.id, User.email)
+                .join(User, User.id == TaskDB.owner_id)
+                .where(
+                    TaskDB.completed == False,
+                    TaskDB.reminder_sent_at.is_(None),
+                    TaskDB.deadline >= now,
+                    TaskDB.deadline < window_end
+                )
+                .order_by(TaskDB.deadline)
+                .limit(settings.reminder_batch_size)
+                .with_for_update(of=TaskDB, skip_locked=True)
+            ).all()
+            if not rows:
+                break
             
-        logger.info(f"Processed {processed_count} tasks in bulk")
-        return {"processed_count": processed_count, "status": "success"}
+            # Keep updated_at as is: sending a reminder is not a user edit
+            connection.execute(
+                update(TaskDB)
+                .where(TaskDB.id.in_([row.id for row in rows]))
+                .values(reminder_sent_at=now, updated_at=TaskDB.updated_at)
+            )
+        
+        by_email: Dict[str, List[int]] = {}
+        for row in rows:
+            by_email.setdefault(row.email, []).append(row.id)
+        for user_email, task_ids in by_email.items():
+            send_task_reminders.delay(user_email, task_ids)
+        
+        reminded += len(rows)
+        if len(rows) < settings.reminder_batch_size:
+            break
+    
+    logger.info(f"Queued deadline reminders for {reminded} tasks")
+    return {"reminded_count": reminded, "status": "success"}
+
+IMPORT_COLUMNS = ["title", "description", "completed", "deadline", "owner_id", "change_seq"]
+
+
+def _read_import_rows(file_path: str, file_format: str) -> Iterator[Tuple[int, Union[dict, str]]]:
+    """Yield (line number, raw row) pairs, CSV dicts or NDJSON lines, without loading the file whole.
+    
+    Line numbers are those of the file itself, counting a CSV header row.
+    """
+    with open(file_path, newline="", encoding="utf-8") as handle:
+        if file_format == "csv":
+            reader = csv.DictReader(handle)
+            for row in reader:
+                # Empty CSV cells mean "not provided"
+                yield reader.line_num, {key: value for key, value in row.items() if value not in ("", None)}
+        else:
+            for line_number, line in enumerate(handle, start=1):
+                if line.strip():
+                    yield line_number, line
+
+
+def _copy_field(value) -> str:
+    """Render one COPY csv field: NULL as an unquoted empty field, anything else quoted."""
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_rows(connection, rows: List[dict]) -> None:
+    """Load rows with Postgres COPY, falling back to executemany INSERT elsewhere."""
+    if connection.dialect.name != "postgresql":
+        connection.execute(insert(TaskDB.__table__), rows)
+        return
+    
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_copy_field(row[column]) for column in IMPORT_COLUMNS))
+        buffer.write("\n")
+    buffer.seek(0)
+    
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY tasks ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _import_finished(user_id: int, progress: dict) -> None:
+    """Invalidate cached reads and notify connected clients after an import."""
+    task_cache.bump_version_sync(user_scope(user_id))
+    task_events.publish_sync(user_id, {
+        "type": "imported",
+        "task_ids": [],
+        "change_seq": progress["change_seq"],
+    })
+
+
+@celery_app.task(bind=True)
+def process_bulk_tasks(self, file_path: str, user_id: int, file_format: str = "ndjson"):
+    """
+    Import tasks for a user from an uploaded CSV or NDJSON file
+    
+    Rows are validated and loaded in chunks of settings.import_chunk_size, each
+    committed on its own so progress is durable and memory stays bounded.
+    Progress is reported through the result backend as PROGRESS state meta.
+    The job is not retried automatically, since a retry would re-insert the
+    chunks that were already committed.
+    """
+    progress = {"user_id": user_id, "processed": 0, "imported": 0, "failed": 0, "errors": []}
+    chunk: List[dict] = []
+    
+    def flush():
+        with engine.begin() as connection:
+            last_seq = connection.execute(
+                reserve_change_seqs(connection.dialect.name, user_id, len(chunk))
+            ).scalar_one()
+            for seq, row in enumerate(chunk, start=last_seq - len(chunk) + 1):
+                row["change_seq"] = seq
+            _copy_rows(connection, chunk)
+            connection.execute(adjust_task_counts(
+                user_id,
+                total_delta=len(chunk),
+                completed_delta=sum(1 for row in chunk if row["completed"])
+            ))
+        progress["imported"] += len(chunk)
+        progress["change_seq"] = last_seq
+        chunk.clear()
+        self.update_state(state="PROGRESS", meta=progress)
+    
+    try:
+        for line_number, raw in _read_import_rows(file_path, file_format):
+            progress["processed"] += 1
+            try:
+                if isinstance(raw, str):
+                    row = TaskImportRow.model_validate_json(raw)
+                else:
+                    row = TaskImportRow.model_validate(raw)
+            except ValidationError as exc:
+                progress["failed"] += 1
+                if len(progress["errors"]) < settings.import_max_reported_errors:
+                    progress["errors"].append({"line": line_number, "detail": str(exc)})
+                continue
+            
+            chunk.append({**row.model_dump(), "owner_id": user_id})
+            if len(chunk) >= settings.import_chunk_size:
+                flush()
+        
+        if chunk:
+            flush()
+        
+        if progress["imported"]:
+            _import_finished(user_id, progress)
+        logger.info(f"Imported {progress['imported']} tasks for user {user_id}, {progress['failed']} rows rejected")
+        return {**progress, "status": "success"}
         
     except Exception as exc:
-        logger.error(f"Error processing bulk tasks: {str(exc)}")
-        raise self.retry(exc=exc, countdown=60, max_retries=3)
+        logger.error(f"Error importing tasks for user {user_id}: {str(exc)}")
+        if progress["imported"]:
+            _import_finished(user_id, progress)
+        raise
     finally:
-        db.close()
\ No newline at end of file
+        if os.path.exists(file_path):
+            os.remove(file_path)
@@ -1,93 +1,635 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy import (
+    and_, cast, column, delete, func, insert, literal, literal_column, null, or_, select, table, union_all, update,
+)
+from sqlalchemy.engine import Row
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 
-from ..database import User, TaskDB
-from ..auth import get_password_hash
-from .models import UserCreate, TaskCreate, TaskUpdate
+from ..database import (
+    User, TaskDB, TaskTombstone, UserTaskState, SEARCH_CONFIG,
+    reserve_change_seqs, adjust_task_counts,
+)
+from ..auth import invalidate_principal, invalidate_principals, password_hasher
+from ..cache import task_cache, user_scope
+from .events import task_events
+from .models import (
+    UserCreate, UserBulkError, TaskCreate, TaskUpdate, TaskBulkUpdateItem, BulkItemError, TaskFilter, TaskSort,
+)
+
+
+# Columns a task list can be ordered by; None means plain ID order
+SORT_COLUMNS = {
+    "id": None,
+    "created_at": TaskDB.created_at,
+    "deadline": TaskDB.deadline,
+}
+
+
+def encode_cursor(task: TaskDB, sort: TaskSort = TaskSort.ID) -> str:
+    """Encode the position after a task as an opaque pagination cursor."""
+    sort_column = SORT_COLUMNS[sort.value.lstrip("-")]
+    payload = {"s": sort.value, "id": task.id}
+    if sort_column is not None:
+        key = getattr(task, sort_column.key)
+        payload["k"] = key.isoformat() if key is not None else None
+    data = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: TaskSort = TaskSort.ID) -> Tuple[Optional[datetime], int]:
+    """Decode a pagination cursor into the last seen (sort key, task ID) position."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        if payload.get("s", TaskSort.ID.value) != sort.value:
+            raise ValueError("cursor was issued for a different sort order")
+        key = payload.get("k")
+        return (datetime.fromisoformat(key) if key else None), int(payload["id"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _sort_key(expression, dialect: str):
+    """A datetime sort key as compared in SQL.
+    
+    SQLite stores datetimes as text, and values from server defaults lack the
+    fractional seconds that bound parameters carry, so both sides are rendered
+    in one format there before comparing or ordering.
+    """
+    if dialect != "sqlite":
+        return expression
+    return func.strftime("%Y-%m-%d %H:%M:%f", expression)
+
+
+def _after_position(sort_column, descending: bool, key: Optional[datetime], last_id: int, dialect: str):
+    """WHERE clause selecting rows that sort after (key, last_id).
+    
+    NULL sort keys are ordered last in both directions.
+    """
+    id_after = TaskDB.id < last_id if descending else TaskDB.id > last_id
+    if sort_column is None:
+        return id_after
+    if key is None:
+        return and_(sort_column.is_(None), id_after)
+    key = _sort_key(literal(key, sort_column.type), dialect)
+    sort_column = _sort_key(sort_column, dialect)
+    key_after = sort_column < key if descending else sort_column > key
+    return or_(key_after, and_(sort_column == key, id_after), sort_column.is_(None))
+
+
+# Task fields that may be left out of an update but never set to null
+REQUIRED_TASK_FIELDS = ("title", "completed")
+
+
+def null_required_fields(data: dict) -> List[str]:
+    """Required task fields that an update explicitly sets to null."""
+    return [field for field in REQUIRED_TASK_FIELDS if field in data and data[field] is None]
+
+
+# SQLite FTS5 index over task title and description, see database.TASK_SEARCH_DDL
+tasks_fts = table("tasks_fts", column("rowid"), column("rank"))
+
+
+def _fts5_query(query_text: str) -> str:
+    """Quote each search term so user input cannot use FTS5 query syntax."""
+    return " ".join('"{}"'.format(term.replace('"', '""')) for term in query_text.split())
+
+
+async def reserve_seqs(db: AsyncSession, user_id: int, count: int = 1) -> int:
+    """Reserve count change sequence numbers for a user; returns the first one."""
+    last = await db.scalar(reserve_change_seqs(db.bind.dialect.name, user_id, count))
+    return last - count + 1
+
+
+async def adjust_counts(db: AsyncSession, user_id: int, total_delta: int = 0, completed_delta: int = 0) -> None:
+    """Apply deltas to a user's maintained task counters within the current transaction."""
+    if total_delta or completed_delta:
+        await db.execute(adjust_task_counts(user_id, total_delta, completed_delta))
+
+
+async def tasks_changed(user_id: int, event_type: str, task_ids: List[int], change_seq: int) -> None:
+    """Run the post-commit hooks for a change to a user's tasks."""
+    await task_cache.bump_version(user_scope(user_id))
+    await task_events.publish(user_id, {
+        "type": event_type,
+        "task_ids": task_ids,
+        "change_seq": change_seq,
+    })
 
 
 class UserCRUD:
     @staticmethod
-    def create_user(db: Session, user: UserCreate) -> User:
+    async def create_user(db: AsyncSession, user: UserCreate) -> User:
         """Create a new user."""
         try:
-            hashed_password = get_password_hash(user.password)
+            hashed_password = await password_hasher.hash(user.password)
             db_user = User(
                 username=user.username,
                 email=user.email,
                 hashed_password=hashed_password
             )
             db.add(db_user)
-            db.commit()
-            db.refresh(db_user)
-            return db_user
+            await db.flush()
+            # A new user has no tasks, so their counters start out known
+            db.add(UserTaskState(owner_id=db_user.id, change_seq=0, total_count=0, completed_count=0))
+            await db.commit()
+            await db.refresh(db_user)
         except IntegrityError:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username or email already registered"
             )
+        # Sets the write marker, so an immediate login does not read a lagging replica
+        await invalidate_principal(db_user.username)
+        return db_user
     
     @staticmethod
-    def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
+    async def bulk_create_users(db: AsyncSession, users: List[UserCreate]) -> Tuple[list, List[UserBulkError]]:
+        """Create many users; returns the created rows and per-row errors.
+        
+        Passwords are hashed in parallel across cores, then all users go in with a
+        single INSERT ... ON CONFLICT DO NOTHING RETURNING, so rows clashing with
+        existing usernames or emails are skipped and reported instead of failing
+        the batch.
+        """
+        errors: List[UserBulkError] = []
+        accepted: List[Tuple[int, UserCreate]] = []
+        usernames, emails = set(), set()
+        for index, user in enumerate(users):
+            if user.username in usernames or user.email in emails:
+                errors.append(UserBulkError(
+                    index=index, username=user.username, detail="Duplicate username or email in request"
+                ))
+                continue
+            usernames.add(user.username)
+            emails.add(user.email)
+            accepted.append((index, user))
+        if not accepted:
+            return [], errors
+        
+        hashed = await password_hasher.hash_many([user.password for _, user in accepted])
+        upsert = postgresql_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+        result = await db.execute(
+            upsert(User)
+            .on_conflict_do_nothing()
+            .returning(User.id, User.username, User.email, User.is_active, User.created_at),
+            [
+                {"username": user.username, "email": user.email, "hashed_password": hashed_password}
+                for (_, user), hashed_password in zip(accepted, hashed)
+            ]
+        )
+        created = {row.username: row for row in result}
+        if created:
+            await db.execute(insert(UserTaskState), [
+                {"owner_id": row.id, "change_seq": 0, "total_count": 0, "completed_count": 0}
+                for row in created.values()
+            ])
+        await db.commit()
+        await invalidate_principals(list(created))
+        
+        for index, user in accepted:
+            if user.username not in created:
+                errors.append(UserBulkError(
+                    index=index, username=user.username, detail="Username or email already registered"
+                ))
+        errors.sort(key=lambda error: error.index)
+        return [created[user.username] for _, user in accepted if user.username in created], errors
+    
+    @staticmethod
+    async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
         """Get user by ID."""
-        return db.query(User).filter(User.id == user_id).first()
+        return await db.get(User, user_id)
     
     @staticmethod
-    def get_user_by_username(db: Session, username: str) -> Optional[User]:
+    async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
         """Get user by username."""
-        return db.query(User).filter(User.username == username).first()
+        return await db.scalar(select(User).where(User.username == username))
     
     @staticmethod
-    def get_user_by_email(db: Session, email: str) -> Optional[User]:
+    async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
         """Get user by email."""
-        return db.query(User).filter(User.email == email).first()
+        return await db.scalar(select(User).where(User.email == email))
+    
+    @staticmethod
+    async def set_user_active(db: AsyncSession, user_id: int, is_active: bool) -> Optional[User]:
+        """Activate or deactivate a user, dropping their cached principals."""
+        db_user = await db.get(User, user_id)
+        if db_user is None:
+            return None
+        db_user.is_active = is_active
+        await db.commit()
+        await invalidate_principal(db_user.username)
+        return db_user
 
 
 class TaskCRUD:
     @staticmethod
-    def create_task(db: Session, task: TaskCreate, user_id: int) -> TaskDB:
+    async def create_task(db: AsyncSession, task: TaskCreate, user_id: int) -> TaskDB:
         """Create a new task for a user."""
-        db_task = TaskDB(**task.dict(), owner_id=user_id)
+        seq = await reserve_seqs(db, user_id)
+        db_task = TaskDB(**task.dict(), owner_id=user_id, change_seq=seq)
         db.add(db_task)
-        db.commit()
-        db.refresh(db_task)
+        await adjust_counts(db, user_id, total_delta=1)
+        await db.commit()
+        await db.refresh(db_task)
+        await tasks_changed(user_id, "created", [db_task.id], seq)
         return db_task
     
     @staticmethod
-    def get_tasks_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[TaskDB]:
-        """Get all tasks for a specific user."""
-        return db.query(TaskDB).filter(TaskDB.owner_id == user_id).offset(skip).limit(limit).all()
+    async def get_tasks_by_user(
+        db: AsyncSession,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[Tuple[Optional[datetime], int]] = None,
+        filters: Optional[TaskFilter] = None
+    ) -> List[TaskDB]:
+        """Get a filtered, sorted page of a user's tasks, optionally after a keyset position."""
+        filters = filters or TaskFilter()
+        query = select(TaskDB).where(TaskDB.owner_id == user_id)
+        if filters.completed is not None:
+            query = query.where(TaskDB.completed == filters.completed)
+        if filters.deadline_before is not None:
+            query = query.where(TaskDB.deadline < filters.deadline_before)
+        if filters.deadline_after is not None:
+            query = query.where(TaskDB.deadline > filters.deadline_after)
+        if filters.created_after is not None:
+            query = query.where(TaskDB.created_at > filters.created_after)
+        
+        descending = filters.sort.value.startswith("-")
+        sort_column = SORT_COLUMNS[filters.sort.value.lstrip("-")]
+        dialect = db.bind.dialect.name
+        if after is not None:
+            query = query.where(_after_position(sort_column, descending, *after, dialect))
+        
+        id_order = TaskDB.id.desc() if descending else TaskDB.id.asc()
+        if sort_column is None:
+            query = query.order_by(id_order)
+        else:
+            sort_key = _sort_key(sort_column, dialect)
+            key_order = sort_key.desc() if descending else sort_key.asc()
+            query = query.order_by(key_order.nulls_last(), id_order)
+        
+        result = await db.scalars(query.offset(skip).limit(limit))
+        return list(result)
+    
+    @staticmethod
+    async def stream_tasks_by_user(
+        db: AsyncSession,
+        user_id: int,
+        batch_size: int = 1000
+    ) -> AsyncIterator[TaskDB]:
+        """Yield every task of a user in ID order through a server-side cursor."""
+        result = await db.stream_scalars(
+            select(TaskDB)
+            .where(TaskDB.owner_id == user_id)
+            .order_by(TaskDB.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for task in result:
+            yield task
     
     @staticmethod
-    def get_task_by_id(db: Session, task_id: int, user_id: int) -> Optional[TaskDB]:
+    async def search_tasks(
+        db: AsyncSession,
+        user_id: int,
+        query_text: str,
+        skip: int = 0,
+        limit: int = 20
+    ) -> List[TaskDB]:
+        """Full-text search a user's tasks, best matches first."""
+        query = select(TaskDB).where(TaskDB.owner_id == user_id)
+        dialect = db.bind.dialect.name
+        if dialect == "postgresql":
+            search_vector = literal_column("tasks.search_vector")
+            ts_query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'"), query_text)
+            query = query.where(search_vector.op("@@")(ts_query)).order_by(
+                func.ts_rank_cd(search_vector, ts_query).desc(), TaskDB.id
+            )
+        elif dialect == "sqlite":
+            fts_query = _fts5_query(query_text)
+            if not fts_query:
+                return []
+            query = (
+                query.join(tasks_fts, tasks_fts.c.rowid == TaskDB.id)
+                .where(literal_column("tasks_fts").op("MATCH")(fts_query))
+                .order_by(tasks_fts.c.rank, TaskDB.id)
+            )
+        else:
+            pattern = f"%{query_text}%"
+            query = query.where(
+                or_(TaskDB.title.ilike(pattern), TaskDB.description.ilike(pattern))
+            ).order_by(TaskDB.id)
+        
+        result = await db.scalars(query.offset(skip).limit(limit))
+        return list(result)
+    
+    @staticmethod
+    async def get_task_by_id(db: AsyncSession, task_id: int, user_id: int) -> Optional[TaskDB]:
         """Get a specific task by ID for a user."""
-        return db.query(TaskDB).filter(TaskDB.id == task_id, TaskDB.owner_id == user_id).first()
+        return await db.scalar(
+            select(TaskDB).where(TaskDB.id == task_id, TaskDB.owner_id == user_id)
+        )
     
     @staticmethod
-    def update_task(db: Session, task_id: int, task_update: TaskUpdate, user_id: int) -> Optional[TaskDB]:
-        """Update a task."""
-        db_task = db.query(TaskDB).filter(TaskDB.id == task_id, TaskDB.owner_id == user_id).first()
-        if not db_task:
-            return None
+    async def update_task(db: AsyncSession, task_id: int, task_update: TaskUpdate, user_id: int) -> Optional[TaskDB]:
+        """Update a task with a single ownership-checked UPDATE ... RETURNING.
         
+        When the update sets completed, it is first tried as a completion flip so
+        the counter delta is known without reading the old row; only if the task
+        was already in that state does a plain update follow.
+        """
         update_data = task_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_task, field, value)
+        nulls = null_required_fields(update_data)
+        if nulls:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"{', '.join(nulls)} cannot be null"
+            )
+        if not update_data:
+            return await TaskCRUD.get_task_by_id(db, task_id, user_id)
+        if "deadline" in update_data:
+            # A moved deadline gets a fresh reminder
+            update_data["reminder_sent_at"] = None
         
-        db.commit()
-        db.refresh(db_task)
+        seq = await reserve_seqs(db, user_id)
+        statement = (
+            update(TaskDB)
+            .where(TaskDB.id == task_id, TaskDB.owner_id == user_id)
+            .values(**update_data, change_seq=seq)
+            .returning(TaskDB)
+            .execution_options(synchronize_session=False)
+        )
+        db_task = None
+        completed_delta = 0
+        if "completed" in update_data:
+            completing = bool(update_data["completed"])
+            flipped = TaskDB.completed.is_not(True) if completing else TaskDB.completed.is_(True)
+            db_task = (await db.scalars(statement.where(flipped))).first()
+            if db_task:
+                completed_delta = 1 if completing else -1
+        if db_task is None:
+            db_task = (await db.scalars(statement)).first()
+        
+        await adjust_counts(db, user_id, completed_delta=completed_delta)
+        await db.commit()
+        if db_task:
+            await tasks_changed(user_id, "updated", [db_task.id], seq)
         return db_task
     
     @staticmethod
-    def delete_task(db: Session, task_id: int, user_id: int) -> bool:
-        """Delete a task."""
-        db_task = db.query(TaskDB).filter(TaskDB.id == task_id, TaskDB.owner_id == user_id).first()
-        if not db_task:
-            return False
+    async def delete_task(db: AsyncSession, task_id: int, user_id: int) -> bool:
+        """Delete a task with a single ownership-checked DELETE ... RETURNING.
+        
+        A tombstone records the deletion for delta sync.
+        """
+        seq = await reserve_seqs(db, user_id)
+        result = await db.execute(
+            delete(TaskDB)
+            .where(TaskDB.id == task_id, TaskDB.owner_id == user_id)
+            .returning(TaskDB.id, TaskDB.completed)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        deleted = row is not None
+        if deleted:
+            db.add(TaskTombstone(task_id=task_id, owner_id=user_id, change_seq=seq))
+            await adjust_counts(db, user_id, total_delta=-1, completed_delta=-1 if row.completed else 0)
+        await db.commit()
+        if deleted:
+            await tasks_changed(user_id, "deleted", [task_id], seq)
+        return deleted
+    
+    @staticmethod
+    async def bulk_create_tasks(db: AsyncSession, tasks: List[TaskCreate], user_id: int) -> List[TaskDB]:
+        """Create many tasks for a user with one INSERT ... RETURNING in one transaction."""
+        first_seq = await reserve_seqs(db, user_id, len(tasks))
+        rows = [
+            {**task.dict(), "owner_id": user_id, "change_seq": first_seq + index}
+            for index, task in enumerate(tasks)
+        ]
+        result = await db.scalars(
+            insert(TaskDB).returning(TaskDB, sort_by_parameter_order=True), rows
+        )
+        created = list(result)
+        await adjust_counts(db, user_id, total_delta=len(created))
+        await db.commit()
+        await tasks_changed(user_id, "created", [task.id for task in created], first_seq + len(created) - 1)
+        return created
+    
+    @staticmethod
+    async def bulk_update_tasks(
+        db: AsyncSession,
+        items: List[TaskBulkUpdateItem],
+        user_id: int
+    ) -> Tuple[List[TaskDB], List[BulkItemError]]:
+        """Update many tasks in one transaction; returns the updated tasks and per-item errors.
+        
+        Items are grouped by the set of fields they change so each group is a single
+        executemany UPDATE. An executemany UPDATE cannot use RETURNING, so the
+        updated rows are read back with one SELECT before commit. Items naming a
+        task the user does not own, or setting a required field to null, are
+        skipped and reported.
+        """
+        ids = [item.id for item in items]
+        first_seq = await reserve_seqs(db, user_id, len(items))
+        # Owned task IDs mapped to their completed state before the update
+        owned = dict((await db.execute(
+            select(TaskDB.id, TaskDB.completed)
+            .where(TaskDB.id.in_(ids), TaskDB.owner_id == user_id)
+            .with_for_update()
+        )).all())
+        
+        errors: List[BulkItemError] = []
+        groups: Dict[Tuple[str, ...], List[dict]] = {}
+        final_completed: Dict[int, bool] = {}
+        applied: List[int] = []
+        for index, item in enumerate(items):
+            if item.id not in owned:
+                errors.append(BulkItemError(index=index, id=item.id, detail="Task not found"))
+                continue
+            data = item.dict(exclude_unset=True)
+            nulls = null_required_fields(data)
+            if nulls:
+                errors.append(BulkItemError(index=index, id=item.id, detail=f"{', '.join(nulls)} cannot be null"))
+                continue
+            if "deadline" in data:
+                data["reminder_sent_at"] = None
+            fields = tuple(sorted(field for field in data if field != "id"))
+            if fields:
+                groups.setdefault(fields, []).append({**data, "change_seq": first_seq + index})
+            if "completed" in data:
+                final_completed[item.id] = data["completed"]
+            applied.append(item.id)
+        
+        for rows in groups.values():
+            await db.execute(
+                update(TaskDB).execution_options(synchronize_session=False), rows
+            )
+        
+        completed_delta = sum(
+            int(completed) - int(bool(owned[task_id]))
+            for task_id, completed in final_completed.items()
+        )
+        await adjust_counts(db, user_id, completed_delta=completed_delta)
+        
+        by_id = {}
+        if applied:
+            result = await db.scalars(select(TaskDB).where(TaskDB.id.in_(applied)))
+            by_id = {task.id: task for task in result}
+        await db.commit()
+        if groups:
+            await tasks_changed(user_id, "updated", list(by_id), first_seq + len(items) - 1)
         
-        db.delete(db_task)
-        db.commit()
-        return True
+        return [by_id[task_id] for task_id in dict.fromkeys(applied)], errors
+    
+    @staticmethod
+    async def bulk_delete_tasks(db: AsyncSession, ids: List[int], user_id: int) -> List[int]:
+        """Delete many tasks with one DELETE ... RETURNING; returns the deleted IDs."""
+        first_seq = await reserve_seqs(db, user_id, len(ids))
+        result = await db.execute(
+            delete(TaskDB)
+            .where(TaskDB.id.in_(ids), TaskDB.owner_id == user_id)
+            .returning(TaskDB.id, TaskDB.completed)
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+        deleted = [row.id for row in rows]
+        if deleted:
+            await db.execute(insert(TaskTombstone), [
+                {"task_id": task_id, "owner_id": user_id, "change_seq": first_seq + index}
+                for index, task_id in enumerate(deleted)
+            ])
+            await adjust_counts(
+                db, user_id,
+                total_delta=-len(rows),
+                completed_delta=-sum(1 for row in rows if row.completed)
+            )
+        await db.commit()
+        if deleted:
+            await tasks_changed(user_id, "deleted", deleted, first_seq + len(deleted) - 1)
+        return deleted
+    
+    @staticmethod
+    async def get_change_seq(db: AsyncSession, user_id: int) -> int:
+        """Last change sequence number handed out for a user's tasks; 0 before their first write."""
+        seq = await db.scalar(select(UserTaskState.change_seq).where(UserTaskState.owner_id == user_id))
+        return seq or 0
+    
+    @staticmethod
+    async def get_sync_horizon(db: AsyncSession, user_id: int) -> Tuple[int, int]:
+        """A user's newest pruned tombstone sequence number and their current one."""
+        row = (await db.execute(
+            select(UserTaskState.pruned_change_seq, UserTaskState.change_seq)
+            .where(UserTaskState.owner_id == user_id)
+        )).first()
+        return (row.pruned_change_seq, row.change_seq) if row else (0, 0)
+    
+    @staticmethod
+    async def get_changes(
+        db: AsyncSession,
+        user_id: int,
+        since: int,
+        limit: int = 500
+    ) -> Tuple[List[Row], List[Row], bool]:
+        """Get the task rows and tombstones changed after a sequence number, oldest first.
+        
+        Both are read with a single UNION ALL so they come from one snapshot;
+        separate reads could see a later deletion but miss an earlier update,
+        and next_since would then skip that update for good. Returns at most
+        limit changes in total and whether more remain.
+        """
+        # Typed NULLs, since Postgres cannot match untyped subquery NULLs to other types
+        task_only = [
+            TaskDB.title, TaskDB.description, TaskDB.completed, TaskDB.deadline, TaskDB.created_at, TaskDB.updated_at,
+        ]
+        tasks = (
+            select(
+                TaskDB.id, *task_only, TaskDB.owner_id, TaskDB.change_seq,
+                cast(null(), TaskTombstone.deleted_at.type).label("deleted_at"),
+            )
+            .where(TaskDB.owner_id == user_id, TaskDB.change_seq > since)
+            .order_by(TaskDB.change_seq)
+            .limit(limit + 1)
+            .subquery()
+        )
+        tombstones = (
+            select(
+                TaskTombstone.task_id,
+                *[cast(null(), column.type).label(column.key) for column in task_only],
+                TaskTombstone.owner_id, TaskTombstone.change_seq, TaskTombstone.deleted_at,
+            )
+            .where(TaskTombstone.owner_id == user_id, TaskTombstone.change_seq > since)
+            .order_by(TaskTombstone.change_seq)
+            .limit(limit + 1)
+            .subquery()
+        )
+        changes = union_all(select(tasks), select(tombstones)).subquery()
+        rows = (await db.execute(
+            select(changes).order_by(changes.c.change_seq).limit(limit + 1)
+        )).all()
+        page = rows[:limit]
+        return (
+            [row for row in page if row.deleted_at is None],
+            [row for row in page if row.deleted_at is not None],
+            len(rows) > limit,
+        )
+    
+    @staticmethod
+    async def get_stats(db: AsyncSession, user_id: int) -> Dict[str, int]:
+        """Get a user's task counts from the maintained counters.
+        
+        Counters are backfilled with one counting query the first time they are
+        read for a user whose tasks predate them. Overdue tasks are counted over
+        the pending-deadline index.
+        """
+        state = await db.get(UserTaskState, user_id)
+        if state is None or state.total_count is None or state.completed_count is None:
+            total, completed = await TaskCRUD._backfill_counts(db, user_id)
+        else:
+            total, completed = state.total_count, state.completed_count
+        
+        overdue = await db.scalar(
+            select(func.count())
+            .select_from(TaskDB)
+            .where(
+                TaskDB.owner_id == user_id,
+                TaskDB.completed == False,
+                TaskDB.deadline < datetime.utcnow()
+            )
+        )
+        return {
+            "total": total,
+            "completed": completed,
+            "pending": total - completed,
+            "overdue": overdue,
+        }
+    
+    @staticmethod
+    async def _backfill_counts(db: AsyncSession, user_id: int) -> Tuple[int, int]:
+        """Count a user's tasks once and store the result in their counters."""
+        # Lock (or create) the state row first so concurrent writers wait for the count
+        await db.execute(reserve_change_seqs(db.bind.dialect.name, user_id, 0))
+        total, completed = (await db.execute(
+            select(func.count(), func.count().filter(TaskDB.completed == True))
+            .where(TaskDB.owner_id == user_id)
+        )).one()
+        await db.execute(
+            update(UserTaskState)
+            .where(UserTaskState.owner_id == user_id)
+            .values(total_count=total, completed_count=completed)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return total, completed
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+from redis.exceptions import RedisError
+
+from ..config import settings
+from ..redis_client import RedisClient, redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class TaskEventBroker:
+    """Fans task change events out to the streams connected to this worker.
+
+    Writers publish each event to a per-user Redis channel. Every worker holds a
+    single pattern subscription and forwards events to its local subscribers, so
+    Redis connections do not grow with the number of connected clients. Without
+    Redis, events are delivered within the publishing process only.
+    """
+
+    def __init__(self, redis: RedisClient, channel_prefix: str = "tasks:events"):
+        self.redis = redis
+        self.channel_prefix = channel_prefix
+        self.subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def _channel(self, user_id: int) -> str:
+        return f"{self.channel_prefix}:{user_id}"
+
+    def _deliver(self, user_id: int, event: dict) -> None:
+        for queue in self.subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A stalled client misses events; it catches up through /tasks/changes
+                logger.warning(f"Dropping task event for slow subscriber of user {user_id}")
+
+    async def publish(self, user_id: int, event: dict) -> None:
+        """Publish a change event for a user to every worker."""
+        client = self.redis.get()
+        if client is None:
+            self._deliver(user_id, event)
+            return
+        try:
+            await client.publish(self._channel(user_id), json.dumps(event))
+        except RedisError as exc:
+            logger.warning(f"Failed to publish task event, delivering locally: {exc}")
+            self._deliver(user_id, event)
+
+    def publish_sync(self, user_id: int, event: dict) -> None:
+        """Publish a change event from synchronous code such as Celery tasks."""
+        client = self.redis.get_sync()
+        if client is None:
+            return
+        try:
+            client.publish(self._channel(user_id), json.dumps(event))
+        except RedisError as exc:
+            logger.warning(f"Failed to publish task event: {exc}")
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[asyncio.Queue]:
+        """Register a queue that receives the user's change events while open."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.event_queue_size)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        self._ensure_listener()
+        try:
+            yield queue
+        finally:
+            queues = self.subscribers.get(user_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.subscribers[user_id]
+
+    def _ensure_listener(self) -> None:
+        if self.redis.get() is None:
+            return
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        """Forward events from Redis to local subscribers, reconnecting on errors."""
+        while True:
+            pubsub = self.redis.get().pubsub()
+            try:
+                await pubsub.psubscribe(f"{self.channel_prefix}:*")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    user_id = int(message["channel"].rsplit(":", 1)[1])
+                    if user_id in self.subscribers:
+                        self._deliver(user_id, json.loads(message["data"]))
+            except RedisError as exc:
+                logger.warning(f"Task event subscription lost, retrying: {exc}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+
+task_events = TaskEventBroker(redis_client)
@@ -1,7 +1,19 @@
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Annotated, List, Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import AfterValidator, BaseModel, EmailStr, Field
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """Convert an aware datetime to naive UTC, the form task deadlines are stored in."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# Deadlines are stored without a time zone; asyncpg rejects aware values bound to them
+Deadline = Annotated[datetime, AfterValidator(to_naive_utc)]
 
 
 # User Models
@@ -28,6 +40,10 @@ class User(UserBase):
         from_attributes = True
 
 
+class UserActiveUpdate(BaseModel):
+    is_active: bool
+
+
 class UserResponse(BaseModel):
     id: int
     username: str
@@ -43,7 +59,7 @@ class UserResponse(BaseModel):
 class TaskBase(BaseModel):
     title: str
     description: Optional[str] = None
-    deadline: Optional[datetime] = None
+    deadline: Optional[Deadline] = None
 
 
 class TaskCreate(TaskBase):
@@ -54,7 +70,11 @@ class TaskUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     completed: Optional[bool] = None
-    deadline: Optional[datetime] = None
+    deadline: Optional[Deadline] = None
+
+
+class TaskImportRow(TaskCreate):
+    completed: bool = False
 
 
 class Task(TaskBase):
@@ -68,10 +88,118 @@ class Task(TaskBase):
         from_attributes = True
 
 
+# Task Listing Models
+class TaskSort(str, Enum):
+    ID = "id"
+    ID_DESC = "-id"
+    CREATED_AT = "created_at"
+    CREATED_AT_DESC = "-created_at"
+    DEADLINE = "deadline"
+    DEADLINE_DESC = "-deadline"
+
+
+class TaskFilter(BaseModel):
+    completed: Optional[bool] = None
+    deadline_before: Optional[Deadline] = None
+    deadline_after: Optional[Deadline] = None
+    created_after: Optional[datetime] = None
+    sort: TaskSort = TaskSort.ID
+
+
+class TaskFileFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+# Bulk Task Models
+MAX_BULK_ITEMS = 1000
+
+
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class TaskBulkUpdateItem(TaskUpdate):
+    id: int
+
+
+class TaskBulkUpdate(BaseModel):
+    tasks: List[TaskBulkUpdateItem] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class TaskBulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class BulkItemError(BaseModel):
+    index: int
+    id: Optional[int] = None
+    detail: str
+
+
+class TaskBulkResult(BaseModel):
+    tasks: List[Task] = []
+    errors: List[BulkItemError] = []
+
+
+class TaskBulkDeleteResult(BaseModel):
+    deleted_ids: List[int] = []
+    errors: List[BulkItemError] = []
+
+
+# Bulk User Models
+class UserBulkCreate(BaseModel):
+    users: List[UserCreate] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class UserBulkError(BaseModel):
+    index: int
+    username: str
+    detail: str
+
+
+class UserBulkResult(BaseModel):
+    users: List[UserResponse] = []
+    errors: List[UserBulkError] = []
+
+
+class TaskStats(BaseModel):
+    total: int
+    completed: int
+    pending: int
+    overdue: int
+
+
+# Sync Models
+class TaskDeletion(BaseModel):
+    id: int
+    change_seq: int
+    deleted_at: datetime
+
+
+class TaskChanges(BaseModel):
+    changed: List[Task]
+    deleted: List[TaskDeletion]
+    next_since: int
+    has_more: bool
+
+
+# Import Job Models
+class TaskImportJob(BaseModel):
+    job_id: str
+    state: str
+    progress: Optional[dict] = None
+
+
 # Token Models
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 class TokenData(BaseModel):
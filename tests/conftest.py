@@ -0,0 +1,108 @@
+"""Shared fixtures: a throwaway database and fakeredis for every Redis client.
+
+Tests run on a temporary SQLite file through aiosqlite unless TEST_DATABASE_URL
+points at an empty database, such as the Postgres service in CI.
+"""
+import os
+import tempfile
+
+# Settings are read when src is first imported, so the test environment goes first
+_db_dir = tempfile.mkdtemp(prefix="taskapi-tests-")
+os.environ.update(
+    DATABASE_URL=os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{os.path.join(_db_dir, 'test.db')}",
+    DATABASE_ASYNC_URL="",
+    DATABASE_READ_URL="",
+    JWT_SECRET_KEY="test-secret-key",
+    REDIS_URL="redis://redis.invalid:6379/0",
+    IMPORT_UPLOAD_DIR=os.path.join(_db_dir, "uploads"),
+    METRICS_ENABLED="False",
+    QUERY_STATS_ENABLED="False",
+)
+
+import fakeredis
+import fakeredis.aioredis
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import delete
+
+from src.auth import principal_cache
+from src.cache import task_cache
+from src.database import Base, async_engine, create_tables, engine
+from src.main import create_app
+from src.redis_client import redis_client
+from src.revocation import token_revocations
+from src.tasks.events import task_events
+
+PASSWORD = "correct-horse-battery"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def tables():
+    create_tables()
+
+
+@pytest.fixture(autouse=True)
+async def fake_redis():
+    """Point the shared Redis clients at one fresh in-memory server."""
+    server = fakeredis.FakeServer()
+    redis_client.use(
+        fakeredis.aioredis.FakeRedis(server=server, decode_responses=True),
+        fakeredis.FakeRedis(server=server, decode_responses=True),
+    )
+    token_revocations.bloom = None
+    task_cache.local.clear()
+    principal_cache.local.clear()
+    yield server
+    await token_revocations.close()
+    await task_events.close()
+    await redis_client.close()
+
+
+@pytest.fixture(autouse=True)
+async def clean_database():
+    yield
+    # aiosqlite connections belong to the test's event loop
+    await async_engine.dispose()
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(delete(table))
+
+
+@pytest.fixture
+def app() -> FastAPI:
+    return create_app(include_assistant=False)
+
+
+@pytest.fixture
+async def client(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def register(client: httpx.AsyncClient, username: str) -> dict:
+    """Register and log in a user; returns Authorization headers."""
+    response = await client.post("/auth/register", json={
+        "username": username, "email": f"{username}@example.com", "password": PASSWORD,
+    })
+    assert response.status_code == 201, response.text
+    response = await client.post("/auth/login", data={"username": username, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+async def headers(client) -> dict:
+    return await register(client, "alice")
+
+
+@pytest.fixture
+async def other_headers(client) -> dict:
+    return await register(client, "mallory")
+
+
+@pytest.fixture
+async def user_id(client, headers) -> int:
+    response = await client.get("/auth/me", headers=headers)
+    return response.json()["id"]
@@ -0,0 +1,13 @@
+from src.main import create_app
+
+
+async def test_app_without_assistant_serves_health_and_tasks(client):
+    response = await client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+
+
+def test_assistant_routes_are_optional():
+    paths = {route.path for route in create_app(include_assistant=False).routes}
+    assert "/tasks/get_tasks" in paths and "/health" in paths
+    assert not any(path.startswith("/assistant") for path in paths)
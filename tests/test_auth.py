@@ -0,0 +1,147 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import src.auth
+from src.auth import PasswordHasher, password_hasher, replica_has_user
+from src.config import settings
+
+
+async def test_admin_deactivation_takes_effect_on_cached_principals(client, headers, other_headers, monkeypatch):
+    monkeypatch.setattr(settings, "admin_usernames", "alice")
+    me = await client.get("/auth/me", headers=other_headers)
+    # A second request is served from the principal cache
+    assert (await client.get("/auth/me", headers=other_headers)).status_code == 200
+
+    response = await client.patch(
+        f"/auth/users/{me.json()['id']}/active", json={"is_active": False}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["is_active"] is False
+    assert (await client.get("/auth/me", headers=other_headers)).status_code == 400
+
+    response = await client.patch(
+        f"/auth/users/{me.json()['id']}/active", json={"is_active": True}, headers=headers
+    )
+    assert (await client.get("/auth/me", headers=other_headers)).status_code == 200
+
+
+async def test_only_admins_change_activation(client, headers, other_headers):
+    me = await client.get("/auth/me", headers=headers)
+    response = await client.patch(
+        f"/auth/users/{me.json()['id']}/active", json={"is_active": False}, headers=other_headers
+    )
+    assert response.status_code == 403
+
+
+async def test_unknown_user_is_not_found(client, headers, monkeypatch):
+    monkeypatch.setattr(settings, "admin_usernames", "alice")
+    response = await client.patch("/auth/users/999999/active", json={"is_active": False}, headers=headers)
+    assert response.status_code == 404
+
+
+async def test_refresh_tokens_rotate(client):
+    await client.post("/auth/register", json={
+        "username": "bob", "email": "bob@example.com", "password": "correct-horse-battery",
+    })
+    response = await client.post("/auth/login", data={"username": "bob", "password": "correct-horse-battery"})
+    refresh_token = response.json()["refresh_token"]
+
+    response = await client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != refresh_token
+    me = await client.get("/auth/me", headers={"Authorization": f"Bearer {rotated['access_token']}"})
+    assert me.json()["username"] == "bob"
+
+    # A consumed refresh token cannot be replayed
+    response = await client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+
+
+async def test_new_users_are_kept_off_the_replica(client, headers, monkeypatch):
+    monkeypatch.setattr(src.auth, "async_read_engine", object())
+    assert await replica_has_user("alice") is False
+    assert await replica_has_user("nobody") is True
+
+
+async def test_a_missing_principal_is_not_cached(client, headers, monkeypatch):
+    load_principal = src.auth.load_principal
+
+    async def lagging_replica(username):
+        return None
+
+    monkeypatch.setattr(src.auth, "load_principal", lagging_replica)
+    assert (await client.get("/auth/me", headers=headers)).status_code == 401
+    monkeypatch.setattr(src.auth, "load_principal", load_principal)
+    assert (await client.get("/auth/me", headers=headers)).status_code == 200
+
+
+async def test_password_hasher_rejects_work_beyond_its_queue():
+    hasher = PasswordHasher(max_workers=1, max_pending=1, max_processes=1)
+    release = threading.Event()
+    try:
+        blocked = asyncio.create_task(hasher._run(release.wait))
+        while hasher.pending == 0:
+            await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as rejected:
+            await hasher.hash("correct-horse-battery")
+        assert rejected.value.status_code == 503
+        assert rejected.value.headers == {"Retry-After": "1"}
+        release.set()
+        await blocked
+        assert await hasher.verify("correct-horse-battery", await hasher.hash("correct-horse-battery"))
+    finally:
+        release.set()
+        hasher.shutdown()
+    stats = hasher.stats()
+    assert (stats["completed"], stats["rejected"], stats["peak_pending"], stats["in_flight"]) == (3, 1, 1, 0)
+
+
+async def test_login_is_shed_with_503_when_the_hasher_is_full(client, headers, monkeypatch):
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+    response = await client.post("/auth/login", data={"username": "alice", "password": "correct-horse-battery"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    # Requests that need no password work are unaffected
+    assert (await client.get("/auth/me", headers=headers)).status_code == 200
+    assert (await client.get("/health/passwords")).json()["rejected"] >= 1
+
+
+@pytest.fixture
+def process_hasher(monkeypatch):
+    monkeypatch.setattr(password_hasher, "max_processes", 1)
+    yield password_hasher
+    if password_hasher._process_pool is not None:
+        password_hasher._process_pool.shutdown()
+        password_hasher._process_pool = None
+
+
+async def test_bulk_provisioning_reports_conflicts_by_index(client, headers, other_headers, process_hasher, monkeypatch):
+    monkeypatch.setattr(settings, "admin_usernames", "alice")
+    users = [
+        {"username": "carol", "email": "carol@example.com", "password": "carol-password"},
+        {"username": "mallory", "email": "new-mallory@example.com", "password": "mallory-password"},
+        {"username": "dave", "email": "dave@example.com", "password": "dave-password"},
+        {"username": "carol", "email": "carol2@example.com", "password": "carol-password"},
+    ]
+    response = await client.post("/auth/users/bulk", json={"users": users}, headers=headers)
+    assert response.status_code == 201
+    assert [user["username"] for user in response.json()["users"]] == ["carol", "dave"]
+    assert [(error["index"], error["username"]) for error in response.json()["errors"]] == [(1, "mallory"), (3, "carol")]
+
+    # Provisioned users can log in straight away and start with empty task state
+    response = await client.post("/auth/login", data={"username": "dave", "password": "dave-password"})
+    assert response.status_code == 200
+    dave = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert (await client.get("/tasks/stats", headers=dave)).json()["total"] == 0
+    assert (await client.get("/tasks/changes", params={"since": 0}, headers=dave)).status_code == 200
+
+
+async def test_only_admins_provision_users(client, headers):
+    response = await client.post("/auth/users/bulk", json={"users": [
+        {"username": "carol", "email": "carol@example.com", "password": "carol-password"},
+    ]}, headers=headers)
+    assert response.status_code == 403
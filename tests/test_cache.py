@@ -0,0 +1,69 @@
+from src.cache import task_cache
+
+
+async def test_bumping_a_scope_invalidates_its_entries():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    assert await task_cache.get_or_load("user:1", "page", loader) == {"value": 1}
+    assert await task_cache.get_or_load("user:1", "page", loader) == {"value": 1}
+    # Another scope is unaffected by the bump
+    assert await task_cache.get_or_load("user:2", "page", loader) == {"value": 2}
+
+    await task_cache.bump_version("user:1")
+    assert await task_cache.get_or_load("user:1", "page", loader) == {"value": 3}
+    assert await task_cache.get_or_load("user:2", "page", loader) == {"value": 2}
+
+
+async def test_other_workers_see_the_bump_through_redis():
+    await task_cache.get_version("user:1")
+    before = await task_cache.get_version("user:1")
+    task_cache.bump_version_sync("user:1")
+    # The local version copy outlives the bump until its TTL; dropping it simulates expiry
+    task_cache.local.clear()
+    assert await task_cache.get_version("user:1") != before
+
+
+async def test_etag_answers_not_modified_until_tasks_change(client, headers):
+    await client.post("/tasks/create", json={"title": "One"}, headers=headers)
+    response = await client.get("/tasks/get_tasks", headers=headers)
+    etag = response.headers["ETag"]
+
+    response = await client.get("/tasks/get_tasks", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    await client.post("/tasks/create", json={"title": "Two"}, headers=headers)
+    response = await client.get("/tasks/get_tasks", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert response.headers["ETag"] != etag
+
+
+async def test_reads_skip_the_write_marker_without_a_replica(client, headers, monkeypatch):
+    await client.post("/tasks/create", json={"title": "One"}, headers=headers)
+    await client.get("/tasks/get_tasks", headers=headers)
+
+    async def fail(scope):
+        raise AssertionError(f"write marker looked up for {scope}")
+
+    monkeypatch.setattr(task_cache, "written_recently", fail)
+    response = await client.get("/tasks/get_tasks", headers=headers)
+    assert response.status_code == 200
+
+
+async def test_etag_and_cached_pages_follow_writes_when_a_bump_is_lost(client, headers, monkeypatch):
+    await client.post("/tasks/create", json={"title": "One"}, headers=headers)
+    response = await client.get("/tasks/get_tasks", headers=headers)
+    etag = response.headers["ETag"]
+
+    async def lost_bump(scope):
+        pass
+
+    monkeypatch.setattr(task_cache, "bump_version", lost_bump)
+    await client.post("/tasks/create", json={"title": "Two"}, headers=headers)
+    response = await client.get("/tasks/get_tasks", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert [task["title"] for task in response.json()] == ["One", "Two"]
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from src.config import settings
+from src.database import TaskArchive, TaskDB, TaskTombstone, engine
+from src.tasks.celery_tasks import _prune_tombstones_batch, cleanup_old_tasks
+
+
+async def test_old_completed_tasks_are_archived_in_batches(client, headers, monkeypatch):
+    monkeypatch.setattr(settings, "cleanup_batch_size", 1)
+    monkeypatch.setattr(settings, "cleanup_batch_sleep_seconds", 0)
+    ids = [(await client.post("/tasks/create", json={"title": f"Task {index}"}, headers=headers)).json()["id"] for index in range(4)]
+    old_done, recent_done, old_pending = ids[:2], ids[2], ids[3]
+    for task_id in old_done + [recent_done]:
+        await client.patch(f"/tasks/{task_id}/complete", headers=headers)
+    response = await client.get("/tasks/changes", params={"since": 0}, headers=headers)
+    since = response.json()["next_since"]
+    aged = datetime.utcnow() - timedelta(days=settings.cleanup_retention_days + 1)
+    with engine.begin() as connection:
+        connection.execute(update(TaskDB).where(TaskDB.id.in_(old_done + [old_pending])).values(updated_at=aged))
+
+    result = cleanup_old_tasks()
+    assert result["deleted_count"] == 2
+
+    with engine.connect() as connection:
+        assert sorted(connection.execute(select(TaskArchive.id)).scalars()) == old_done
+        assert connection.execute(select(func.count()).select_from(TaskDB)).scalar_one() == 2
+    response = await client.get("/tasks/get_tasks", headers=headers)
+    assert sorted(task["id"] for task in response.json()) == [recent_done, old_pending]
+    response = await client.get("/tasks/changes", params={"since": since}, headers=headers)
+    assert sorted(deletion["id"] for deletion in response.json()["deleted"]) == old_done
+    stats = (await client.get("/tasks/stats", headers=headers)).json()
+    assert (stats["total"], stats["completed"], stats["pending"]) == (2, 1, 1)
+
+
+async def test_changes_older_than_pruned_tombstones_require_a_resync(client, headers):
+    kept = (await client.post("/tasks/create", json={"title": "Kept"}, headers=headers)).json()
+    gone = (await client.post("/tasks/create", json={"title": "Gone"}, headers=headers)).json()
+    response = await client.get("/tasks/changes", params={"since": 0}, headers=headers)
+    since = response.json()["next_since"]
+    await client.delete(f"/tasks/{gone['id']}", headers=headers)
+    with engine.begin() as connection:
+        connection.execute(update(TaskTombstone).values(deleted_at=datetime.utcnow() - timedelta(days=365)))
+
+    assert _prune_tombstones_batch(datetime.utcnow() - timedelta(days=90)) == 1
+
+    response = await client.get("/tasks/changes", params={"since": since}, headers=headers)
+    assert response.status_code == 410
+    resync_since = int(response.headers["X-Resync-Since"])
+    response = await client.get("/tasks/get_tasks", headers=headers)
+    assert [task["id"] for task in response.json()] == [kept["id"]]
+    response = await client.get("/tasks/changes", params={"since": resync_since}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["changed"] == [] and response.json()["deleted"] == []
+
+
+async def test_recent_tombstones_are_kept(client, headers):
+    task = (await client.post("/tasks/create", json={"title": "Gone"}, headers=headers)).json()
+    await client.delete(f"/tasks/{task['id']}", headers=headers)
+
+    assert _prune_tombstones_batch(datetime.utcnow() - timedelta(days=90)) == 0
+    response = await client.get("/tasks/changes", params={"since": 0}, headers=headers)
+    assert [deletion["id"] for deletion in response.json()["deleted"]] == [task["id"]]
@@ -0,0 +1,15 @@
+import asyncio
+
+from src.tasks.events import task_events
+
+
+async def test_mutations_are_published_to_the_owner(client, headers, user_id):
+    async with task_events.subscribe(user_id) as queue:
+        # Let the pattern subscription start before publishing
+        await asyncio.sleep(0.1)
+        response = await client.post("/tasks/create", json={"title": "Pushed"}, headers=headers)
+        event = await asyncio.wait_for(queue.get(), timeout=2)
+
+    assert event["type"] == "created"
+    assert event["task_ids"] == [response.json()["id"]]
+    assert event["change_seq"] == 1
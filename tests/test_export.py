@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+
+import src.tasks.api
+from src.tasks.api import EXPORT_FIELDS
+
+
+async def test_ndjson_export_streams_only_the_users_tasks_in_id_order(client, headers, other_headers, monkeypatch):
+    # Several chunks, the last one partial
+    monkeypatch.setattr(src.tasks.api, "EXPORT_CHUNK_ROWS", 2)
+    titles = [f"Task {index}" for index in range(5)]
+    for title in titles:
+        await client.post("/tasks/create", json={"title": title}, headers=headers)
+    await client.post("/tasks/create", json={"title": "Not mine"}, headers=other_headers)
+
+    response = await client.get("/tasks/export", params={"format": "ndjson"}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["title"] for row in rows] == titles
+    assert all(list(row) == EXPORT_FIELDS for row in rows)
+
+
+async def test_csv_export_has_a_header_row(client, headers):
+    await client.post("/tasks/create", json={"title": "Comma, inside", "deadline": "2030-01-01T00:00:00"}, headers=headers)
+
+    response = await client.get("/tasks/export", params={"format": "csv"}, headers=headers)
+    assert response.headers["content-disposition"] == 'attachment; filename="tasks.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["title"], row["deadline"], row["completed"]) for row in rows] == [
+        ("Comma, inside", "2030-01-01T00:00:00", "False")
+    ]
+
+
+async def test_export_of_no_tasks_is_empty(client, headers):
+    response = await client.get("/tasks/export", params={"format": "ndjson"}, headers=headers)
+    assert response.status_code == 200
+    assert response.text == ""
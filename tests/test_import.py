@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from src.tasks.celery_tasks import process_bulk_tasks
+
+
+@pytest.fixture(autouse=True)
+def no_result_backend(monkeypatch):
+    monkeypatch.setattr(process_bulk_tasks, "update_state", lambda **kwargs: None)
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+async def test_ndjson_import_loads_valid_rows_and_reports_the_rest(client, headers, user_id, tmp_path):
+    lines = [
+        json.dumps({"title": "Imported one", "completed": True}),
+        json.dumps({"description": "no title"}),
+        json.dumps({"title": "Imported two", "deadline": "2030-01-01T00:00:00"}),
+    ]
+    path = write(tmp_path, "tasks.ndjson", "\n".join(lines) + "\n")
+
+    result = process_bulk_tasks(path, user_id, "ndjson")
+
+    assert result["status"] == "success"
+    assert (result["processed"], result["imported"], result["failed"]) == (3, 2, 1)
+    assert result["errors"][0]["line"] == 2
+    response = await client.get("/tasks/stats", headers=headers)
+    assert response.json()["total"] == 2 and response.json()["completed"] == 1
+    response = await client.get("/tasks/changes", params={"since": 0}, headers=headers)
+    assert [task["title"] for task in response.json()["changed"]] == ["Imported one", "Imported two"]
+
+
+async def test_csv_import_treats_empty_cells_as_missing(client, headers, user_id, tmp_path):
+    path = write(tmp_path, "tasks.csv", "title,description,completed,deadline\nFrom CSV,,false,\n")
+
+    result = process_bulk_tasks(path, user_id, "csv")
+
+    assert result["imported"] == 1
+    response = await client.get("/tasks/get_tasks", headers=headers)
+    assert [(task["title"], task["description"]) for task in response.json()] == [("From CSV", None)]
+
+
+@pytest.mark.parametrize("content", ["", "\n\n", json.dumps({"description": "no title"}) + "\n"])
+async def test_import_without_valid_rows_still_succeeds(client, headers, user_id, tmp_path, content):
+    path = write(tmp_path, "tasks.ndjson", content)
+
+    result = process_bulk_tasks(path, user_id, "ndjson")
+
+    assert result["status"] == "success"
+    assert result["imported"] == 0
+    assert result["failed"] == len(result["errors"])
+    response = await client.get("/tasks/stats", headers=headers)
+    assert response.json()["total"] == 0
+
+
+async def test_csv_errors_report_file_line_numbers(user_id, tmp_path):
+    path = write(tmp_path, "tasks.csv", "title,completed\nGood,false\n,false\nAlso good,maybe\n")
+
+    result = process_bulk_tasks(path, user_id, "csv")
+
+    assert result["imported"] == 1
+    assert [error["line"] for error in result["errors"]] == [3, 4]
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+from src.metrics import reap_dead_workers
+
+
+def test_dead_workers_lose_their_live_gauges(monkeypatch, tmp_path):
+    finished = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    dead_pid = int(finished.stdout)
+    for name in (f"gauge_livesum_{dead_pid}.db", f"gauge_livesum_{os.getpid()}.db", f"counter_{dead_pid}.db"):
+        (tmp_path / name).write_bytes(b"")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    reap_dead_workers()
+
+    # Counters of dead workers still count towards the totals
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([
+        f"gauge_livesum_{os.getpid()}.db", f"counter_{dead_pid}.db",
+    ])
@@ -0,0 +1,26 @@
+from sqlalchemy import delete, select, update
+
+from src.database import TaskDB, UserTaskState, engine
+from src.migrate import backfill_change_seqs
+
+
+async def test_backfill_numbers_tasks_that_predate_change_seq(client, headers):
+    ids = []
+    for index in range(5):
+        response = await client.post("/tasks/create", json={"title": f"Task {index}"}, headers=headers)
+        ids.append(response.json()["id"])
+    # Rows as add_missing_columns leaves them: the column default and no counter yet
+    with engine.begin() as connection:
+        connection.execute(update(TaskDB).values(change_seq=0))
+        connection.execute(delete(UserTaskState))
+    response = await client.post("/tasks/create", json={"title": "Written before the backfill"}, headers=headers)
+    ids.append(response.json()["id"])
+
+    assert backfill_change_seqs(batch_size=2) == 5
+    assert backfill_change_seqs(batch_size=2) == 0
+
+    with engine.connect() as connection:
+        seqs = connection.execute(select(TaskDB.change_seq)).scalars().all()
+    assert sorted(seqs) == list(range(1, 7))
+    response = await client.get("/tasks/changes", params={"since": 0}, headers=headers)
+    assert sorted(task["id"] for task in response.json()["changed"]) == sorted(ids)
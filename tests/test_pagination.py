@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from src.tasks.crud import decode_cursor, encode_cursor
+from src.tasks.models import TaskSort
+
+
+class Row:
+    def __init__(self, id, created_at=None, deadline=None):
+        self.id = id
+        self.created_at = created_at
+        self.deadline = deadline
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(Row(7))) == (None, 7)
+    created = datetime(2024, 5, 1, 12, 30)
+    cursor = encode_cursor(Row(7, created_at=created), TaskSort.CREATED_AT_DESC)
+    assert decode_cursor(cursor, TaskSort.CREATED_AT_DESC) == (created, 7)
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "e30", encode_cursor(Row(1), TaskSort.ID)])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, TaskSort.DEADLINE)
+    assert exc.value.status_code == 400
+
+
+async def collect_pages(client, headers, **params):
+    ids, cursor = [], None
+    for _ in range(20):
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/tasks/get_tasks", params=query, headers=headers)
+        assert response.status_code == 200, response.text
+        ids += [task["id"] for task in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+    raise AssertionError(f"pagination did not terminate: {ids}")
+
+
+async def test_keyset_pages_by_id(client, headers):
+    created = []
+    for index in range(5):
+        response = await client.post("/tasks/create", json={"title": f"Task {index}"}, headers=headers)
+        created.append(response.json()["id"])
+
+    assert await collect_pages(client, headers, limit=2) == created
+    assert await collect_pages(client, headers, limit=2, sort="-id") == created[::-1]
+
+
+async def test_keyset_pages_by_deadline_with_nulls_last(client, headers):
+    deadlines = ["2030-01-03T00:00:00", None, "2030-01-01T00:00:00", "2030-01-02T00:00:00", None]
+    ids = []
+    for index, deadline in enumerate(deadlines):
+        response = await client.post(
+            "/tasks/create", json={"title": f"Task {index}", "deadline": deadline}, headers=headers
+        )
+        ids.append(response.json()["id"])
+
+    assert await collect_pages(client, headers, limit=2, sort="deadline") == [ids[2], ids[3], ids[0], ids[1], ids[4]]
+
+
+async def test_keyset_pages_by_created_at_within_one_second(client, headers):
+    # SQLite's CURRENT_TIMESTAMP has one-second resolution, so these share created_at
+    ids = []
+    for index in range(5):
+        response = await client.post("/tasks/create", json={"title": f"Task {index}"}, headers=headers)
+        ids.append(response.json()["id"])
+
+    assert await collect_pages(client, headers, limit=2, sort="created_at") == ids
+    assert await collect_pages(client, headers, limit=2, sort="-created_at") == ids[::-1]
@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from src.database import PoolMetrics, timed_pool_class
+
+
+def queue_engine(metrics: PoolMetrics, max_overflow: int):
+    engine = create_engine(
+        "sqlite://",
+        poolclass=timed_pool_class(QueuePool, metrics),
+        pool_size=1,
+        max_overflow=max_overflow,
+        pool_timeout=0.05,
+    )
+    metrics.attach(engine)
+    return engine
+
+
+def test_checkout_timeouts_and_overflow_are_counted():
+    metrics = PoolMetrics("test")
+    engine = queue_engine(metrics, max_overflow=1)
+    with engine.connect(), engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        assert metrics.stats()["in_use"] == 2
+
+    stats = metrics.stats()
+    assert stats["pool"] == "TimedQueuePool"
+    assert (stats["checkouts"], stats["in_use"], stats["peak_in_use"]) == (2, 0, 2)
+    assert (stats["connects"], stats["overflow_events"], stats["timeouts"]) == (2, 1, 1)
+    assert stats["wait_seconds_max"] >= 0.05
+    engine.dispose()
+
+
+def test_connections_are_reused_within_the_pool():
+    metrics = PoolMetrics("test")
+    engine = queue_engine(metrics, max_overflow=0)
+    for _ in range(3):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    stats = metrics.stats()
+    assert (stats["checkouts"], stats["connects"], stats["timeouts"]) == (3, 1, 0)
+    engine.dispose()
+
+
+async def test_health_db_reports_the_app_pools(client, headers):
+    await client.get("/tasks/get_tasks", headers=headers)
+    report = (await client.get("/health/db")).json()
+    assert {"primary", "primary_async"} <= set(report["pools"])
+    assert report["pools"]["primary_async"]["checkouts"] > 0
+    assert report["pools"]["primary_async"]["in_use"] == 0
+    assert report["replica"]["configured"] is False
@@ -0,0 +1,44 @@
+import time
+
+import httpx
+import pytest
+
+from src.config import settings
+from src.profiling import ProfilingMiddleware, sign_profile_request
+
+
+@pytest.fixture
+async def profiled_client(app, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "profiling_secret", "profile-secret")
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+    transport = httpx.ASGITransport(app=ProfilingMiddleware(app))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def test_signed_header_profiles_one_request(profiled_client, headers, tmp_path):
+    signed = sign_profile_request("GET", "/tasks/get_tasks", int(time.time()) + 60)
+    request_headers = {**headers, "X-Profile": signed}
+
+    response = await profiled_client.get("/tasks/get_tasks", headers=request_headers)
+    assert response.status_code == 200
+    file_name = response.headers["X-Profile-File"]
+    assert "/" not in file_name
+    assert (tmp_path / file_name).exists()
+
+    # Replaying the same header serves the request without profiling it
+    response = await profiled_client.get("/tasks/get_tasks", headers=request_headers)
+    assert response.status_code == 200
+    assert "X-Profile-File" not in response.headers
+
+
+@pytest.mark.parametrize("path, lifetime", [
+    ("/tasks/stats", 60),
+    ("/tasks/get_tasks", -1),
+    ("/tasks/get_tasks", 3600),
+])
+async def test_mismatched_expired_or_long_lived_headers_are_ignored(profiled_client, headers, path, lifetime):
+    signed = sign_profile_request("GET", path, int(time.time()) + lifetime)
+    response = await profiled_client.get("/tasks/get_tasks", headers={**headers, "X-Profile": signed})
+    assert response.status_code == 200
+    assert "X-Profile-File" not in response.headers
@@ -0,0 +1,50 @@
+import logging
+import re
+
+import httpx
+import pytest
+
+import src.query_stats
+from src.config import settings
+from src.main import create_app
+from src.query_stats import QueryStatsMiddleware, RequestQueryStats
+
+
+@pytest.fixture
+async def stats_client(monkeypatch):
+    monkeypatch.setattr(settings, "query_stats_enabled", True)
+    monkeypatch.setattr(src.query_stats, "route_query_stats", {})
+    transport = httpx.ASGITransport(app=create_app(include_assistant=False))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def test_requests_report_their_queries(stats_client, headers):
+    for _ in range(2):
+        response = await stats_client.get("/tasks/get_tasks", headers=headers)
+    timing = re.fullmatch(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers["Server-Timing"])
+    assert timing and int(timing.group(1)) > 0
+
+    report = (await stats_client.get("/health/queries")).json()
+    totals = report["GET /tasks/get_tasks"]
+    assert totals["requests"] == 2
+    # The first request also loads the principal, the second hits its cache
+    assert totals["max_queries"] > int(timing.group(1))
+    assert totals["queries"] == totals["max_queries"] + int(timing.group(1))
+
+
+def test_repeated_statements_are_logged_as_n_plus_one(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "query_repeat_threshold", 3)
+    monkeypatch.setattr(src.query_stats, "route_query_stats", {})
+    stats = RequestQueryStats()
+    for _ in range(3):
+        stats.record("SELECT * FROM tasks WHERE id = ?", 0.001)
+    stats.record("SELECT * FROM users WHERE id = ?", 0.001)
+
+    with caplog.at_level(logging.WARNING, logger="src.query_stats"):
+        QueryStatsMiddleware(app=None)._finish("GET /tasks", stats)
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "GET /tasks ran the same statement 3 times: SELECT * FROM tasks WHERE id = ?"
+    ]
+    assert src.query_stats.query_stats_report()["GET /tasks"]["max_queries"] == 4
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.config import settings
+from src.tasks.celery_tasks import schedule_task_reminders, send_task_reminders
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    calls = []
+    monkeypatch.setattr(send_task_reminders, "delay", lambda user_email, task_ids: calls.append((user_email, task_ids)))
+    return calls
+
+
+def in_hours(hours: float) -> str:
+    return (datetime.utcnow() + timedelta(hours=hours)).isoformat()
+
+
+async def create(client, headers, title, deadline):
+    response = await client.post("/tasks/create", json={"title": title, "deadline": deadline}, headers=headers)
+    return response.json()["id"]
+
+
+async def test_due_tasks_are_reminded_once_per_user_and_batch(client, headers, sent, monkeypatch):
+    monkeypatch.setattr(settings, "reminder_batch_size", 2)
+    due = [await create(client, headers, f"Due {index}", in_hours(index + 1)) for index in range(3)]
+    await create(client, headers, "Later", in_hours(settings.reminder_window_hours + 24))
+    await create(client, headers, "Missed", in_hours(-1))
+    done = await create(client, headers, "Done", in_hours(1))
+    await client.patch(f"/tasks/{done}/complete", headers=headers)
+
+    assert schedule_task_reminders()["reminded_count"] == 3
+    assert sorted(task_id for _, task_ids in sent for task_id in task_ids) == due
+    assert {email for email, _ in sent} == {"alice@example.com"}
+    assert len(sent) == 2
+
+    sent.clear()
+    assert schedule_task_reminders()["reminded_count"] == 0
+    assert sent == []
+
+
+async def test_moving_a_deadline_rearms_its_reminder(client, headers, sent):
+    task_id = await create(client, headers, "Due", in_hours(1))
+    schedule_task_reminders()
+    sent.clear()
+
+    await client.put(f"/tasks/{task_id}", json={"deadline": in_hours(2)}, headers=headers)
+    assert schedule_task_reminders()["reminded_count"] == 1
+    assert sent == [("alice@example.com", [task_id])]
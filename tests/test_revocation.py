@@ -0,0 +1,35 @@
+import time
+
+from src.revocation import BloomFilter, token_revocations
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"jti-{index}" for index in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{index}" in bloom for index in range(10000))
+    assert false_positives < 300
+
+
+def test_bloom_filter_counts_distinct_items():
+    bloom = BloomFilter(capacity=100, error_rate=0.01)
+    bloom.add("a")
+    bloom.add("a")
+    bloom.add("b")
+    assert bloom.count == 2
+
+
+async def test_revoke_is_single_use_and_checked():
+    expires_at = int(time.time()) + 60
+    assert await token_revocations.is_revoked("jti-1") is False
+    assert await token_revocations.revoke("jti-1", expires_at) is True
+    assert await token_revocations.revoke("jti-1", expires_at) is False
+    assert await token_revocations.is_revoked("jti-1") is True
+
+
+async def test_logout_revokes_the_access_token(client, headers):
+    assert (await client.get("/auth/me", headers=headers)).status_code == 200
+    assert (await client.post("/auth/logout", headers=headers)).status_code == 204
+    assert (await client.get("/auth/me", headers=headers)).status_code == 401
@@ -0,0 +1,155 @@
+async def create(client, headers, title="Task", **fields):
+    response = await client.post("/tasks/create", json={"title": title, **fields}, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+async def stats(client, headers):
+    response = await client.get("/tasks/stats", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_counters_follow_every_mutation(client, headers):
+    first = await create(client, headers, "One")
+    second = await create(client, headers, "Two")
+    assert await stats(client, headers) == {"total": 2, "completed": 0, "pending": 2, "overdue": 0}
+
+    await client.patch(f"/tasks/{first['id']}/complete", headers=headers)
+    # Completing an already completed task must not count it twice
+    await client.put(f"/tasks/{first['id']}", json={"completed": True}, headers=headers)
+    assert (await stats(client, headers))["completed"] == 1
+
+    response = await client.post("/tasks/bulk", json={"tasks": [{"title": "Three"}, {"title": "Four"}]}, headers=headers)
+    assert response.status_code == 201, response.text
+    response = await client.patch("/tasks/bulk", json={"tasks": [
+        {"id": second["id"], "completed": True},
+        {"id": first["id"], "completed": False},
+    ]}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert await stats(client, headers) == {"total": 4, "completed": 1, "pending": 3, "overdue": 0}
+
+    await client.delete(f"/tasks/{second['id']}", headers=headers)
+    assert await stats(client, headers) == {"total": 3, "completed": 0, "pending": 3, "overdue": 0}
+
+
+async def test_overdue_counts_pending_tasks_past_deadline(client, headers):
+    await create(client, headers, "Late", deadline="2000-01-01T00:00:00")
+    done = await create(client, headers, "Late but done", deadline="2000-01-01T00:00:00")
+    await create(client, headers, "Future", deadline="2999-01-01T00:00:00")
+    await client.patch(f"/tasks/{done['id']}/complete", headers=headers)
+    assert (await stats(client, headers))["overdue"] == 1
+
+
+async def test_changes_report_updates_and_tombstones_in_sequence(client, headers):
+    first = await create(client, headers, "One")
+    second = await create(client, headers, "Two")
+    response = await client.get("/tasks/changes", params={"since": 0}, headers=headers)
+    body = response.json()
+    assert [task["id"] for task in body["changed"]] == [first["id"], second["id"]]
+    since = body["next_since"]
+
+    await client.put(f"/tasks/{first['id']}", json={"title": "One, renamed"}, headers=headers)
+    await client.delete(f"/tasks/{second['id']}", headers=headers)
+    response = await client.get("/tasks/changes", params={"since": since}, headers=headers)
+    body = response.json()
+    assert [task["title"] for task in body["changed"]] == ["One, renamed"]
+    assert [deletion["id"] for deletion in body["deleted"]] == [second["id"]]
+    assert body["next_since"] == since + 2
+    assert body["has_more"] is False
+
+    response = await client.get("/tasks/changes", params={"since": body["next_since"]}, headers=headers)
+    assert response.json() == {"changed": [], "deleted": [], "next_since": since + 2, "has_more": False}
+
+
+async def test_changes_are_paged_by_limit(client, headers):
+    for index in range(5):
+        await create(client, headers, f"Task {index}")
+    response = await client.get("/tasks/changes", params={"since": 0, "limit": 3}, headers=headers)
+    body = response.json()
+    assert len(body["changed"]) == 3 and body["has_more"] is True
+    response = await client.get("/tasks/changes", params={"since": body["next_since"], "limit": 3}, headers=headers)
+    body = response.json()
+    assert len(body["changed"]) == 2 and body["has_more"] is False
+
+
+async def test_tasks_are_private_to_their_owner(client, headers, other_headers):
+    task = await create(client, headers, "Mine")
+    other = other_headers
+    assert (await client.get(f"/tasks/{task['id']}", headers=other)).status_code == 404
+    assert (await client.delete(f"/tasks/{task['id']}", headers=other)).status_code == 404
+    assert (await client.get(f"/tasks/{task['id']}", headers=headers)).status_code == 200
+
+
+async def test_search_ranks_matches(client, headers):
+    await create(client, headers, "Buy milk", description="and bread")
+    await create(client, headers, "Write report")
+    response = await client.get("/tasks/search", params={"q": "milk"}, headers=headers)
+    assert [task["title"] for task in response.json()] == ["Buy milk"]
+
+
+async def test_bulk_update_reports_nulls_and_unknown_ids_per_item(client, headers):
+    first = await create(client, headers, "One")
+    second = await create(client, headers, "Two")
+    response = await client.patch("/tasks/bulk", json={"tasks": [
+        {"id": first["id"], "completed": None},
+        {"id": second["id"], "title": "Two, renamed"},
+        {"id": second["id"] + 1000, "title": "Missing"},
+        {"id": first["id"], "title": None, "description": "kept out"},
+    ]}, headers=headers)
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [task["title"] for task in body["tasks"]] == ["Two, renamed"]
+    assert [(error["index"], error["detail"]) for error in body["errors"]] == [
+        (0, "completed cannot be null"),
+        (2, "Task not found"),
+        (3, "title cannot be null"),
+    ]
+    response = await client.get("/tasks/get_tasks", headers=headers)
+    assert response.status_code == 200
+    assert [(task["title"], task["completed"], task["description"]) for task in response.json()] == [
+        ("One", False, None), ("Two, renamed", False, None),
+    ]
+
+
+async def test_changes_interleave_updates_and_deletions_across_pages(client, headers):
+    tasks = [await create(client, headers, f"Task {index}") for index in range(3)]
+    await client.delete(f"/tasks/{tasks[0]['id']}", headers=headers)
+    await client.put(f"/tasks/{tasks[1]['id']}", json={"title": "Renamed"}, headers=headers)
+    await client.delete(f"/tasks/{tasks[2]['id']}", headers=headers)
+
+    seen, since = [], 0
+    while True:
+        response = await client.get("/tasks/changes", params={"since": since, "limit": 1}, headers=headers)
+        body = response.json()
+        seen += [("changed", task["title"]) for task in body["changed"]]
+        seen += [("deleted", deletion["id"]) for deletion in body["deleted"]]
+        since = body["next_since"]
+        if not body["has_more"]:
+            break
+    assert seen == [("deleted", tasks[0]["id"]), ("changed", "Renamed"), ("deleted", tasks[2]["id"])]
+
+
+async def test_deadlines_with_an_offset_are_stored_as_naive_utc(client, headers):
+    task = await create(client, headers, "Call", deadline="2030-01-01T10:00:00+02:00")
+    assert task["deadline"] == "2030-01-01T08:00:00"
+    await create(client, headers, "Later", deadline="2030-01-01T12:00:00Z")
+
+    response = await client.put(f"/tasks/{task['id']}", json={"deadline": "2030-01-01T09:30:00.000Z"}, headers=headers)
+    assert response.json()["deadline"] == "2030-01-01T09:30:00"
+    response = await client.get(
+        "/tasks/get_tasks", params={"deadline_before": "2030-01-01T12:00:00+01:00"}, headers=headers
+    )
+    assert [task["title"] for task in response.json()] == ["Call"]
+
+
+async def test_update_rejects_null_required_fields(client, headers):
+    task = await create(client, headers, "Keep me")
+    for field in ("title", "completed"):
+        response = await client.put(f"/tasks/{task['id']}", json={field: None}, headers=headers)
+        assert response.status_code == 422, response.text
+    response = await client.put(f"/tasks/{task['id']}", json={"description": None}, headers=headers)
+    assert response.status_code == 200
+    response = await client.get("/tasks/get_tasks", headers=headers)
+    assert [(task["title"], task["completed"]) for task in response.json()] == [("Keep me", False)]